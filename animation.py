@@ -0,0 +1,302 @@
+"""
+Animated GIF/WebP and video conversion.
+
+Usage:
+    python main.py animate <input> <output> [--detail 1.0|auto] [--thickness 1]
+        [--brightness 1.0] [--style smooth] [--color-mode black_on_white]
+        [--workers N] [--queue-size 8] [--reuse-threshold 0] [--reuse-tile 64]
+
+Frames are decoded on a producer thread into a bounded queue, rendered in
+order on a thread pool (tiles.ordered_map) and written one at a time, so memory
+use does not grow with the length of the clip. Animated GIF/WebP input is read
+with Pillow (which handles frame disposal), anything else with
+cv2.VideoCapture. GIF and video outputs are streamed to disk; animated WebP is
+muxed at the end from a memory-mapped spool file, because libwebp needs every
+frame before it can write the file.
+
+With --reuse-threshold, frames are rendered incrementally instead (see
+temporal.py): only tiles that changed since the previous frame are re-rendered,
+which suits screen recordings and other mostly static footage.
+
+--detail auto picks the detail from the first frame and keeps it for the whole
+clip, so lines do not flicker as the thresholds follow each frame.
+"""
+import argparse
+import itertools
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+from PIL import GifImagePlugin, Image, ImageSequence
+
+from engine import AUTO_DETAIL, COLOR_MODES, STYLES, RenderParams, auto_params, parse_detail, render
+from temporal import DEFAULT_TILE, TemporalRenderer
+from tiles import ordered_map
+
+ANIMATED_EXTENSIONS = ('.gif', '.webp')
+VIDEO_FOURCC = {'.mp4': 'mp4v', '.mov': 'mp4v', '.m4v': 'mp4v', '.avi': 'MJPG', '.mkv': 'XVID'}
+OUTPUT_EXTENSIONS = ANIMATED_EXTENSIONS + tuple(VIDEO_FOURCC)
+
+# Decoded frames buffered ahead of the render workers
+DEFAULT_QUEUE_SIZE = 8
+# Frame duration when the source does not specify one
+DEFAULT_FRAME_MS = 100
+# Log throughput every this many frames
+PROGRESS_EVERY = 50
+
+
+def iter_frames(path):
+    """
+    Yield (gray frame, duration in ms) for every frame of an animation or video
+    """
+    if os.path.splitext(path)[1].lower() in ANIMATED_EXTENSIONS:
+        with Image.open(path) as im:
+            for frame in ImageSequence.Iterator(im):
+                # Same conversion as a still upload (palette -> RGB -> gray)
+                gray = cv2.cvtColor(np.asarray(frame.convert("RGB")), cv2.COLOR_RGB2GRAY)
+                yield gray, frame.info.get("duration") or DEFAULT_FRAME_MS
+        return
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    duration = 1000.0 / fps if fps and fps > 0 else DEFAULT_FRAME_MS
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), duration
+    finally:
+        cap.release()
+
+
+def prefetch(items, maxsize=DEFAULT_QUEUE_SIZE):
+    """
+    Iterate `items` on a producer thread, holding at most maxsize items ahead
+    of the consumer. Errors in the producer are re-raised in the consumer.
+    """
+    buffer = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((True, item)):
+                    return
+            put((False, None))
+        except Exception as e:
+            put((False, e))
+
+    producer = threading.Thread(target=produce, name="frame-reader", daemon=True)
+    producer.start()
+    try:
+        while True:
+            more, item = buffer.get()
+            if not more:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+class GifFrameWriter:
+    """
+    Streams grayscale frames into a looping animated GIF; the file is
+    created with the first frame, so no frames write nothing
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def write(self, frame, duration):
+        img = Image.fromarray(frame)
+        if self._file is None:
+            header, _ = GifImagePlugin.getheader(img, info={"loop": 0})
+            self._file = open(self.path, "wb")
+            self._file.writelines(header)
+        self._file.writelines(GifImagePlugin.getdata(img, duration=int(round(duration))))
+
+    def close(self):
+        if self._file is not None:
+            self._file.write(b";")
+            self._file.close()
+
+
+class WebPFrameWriter:
+    """
+    Spools raw frames to a temporary file and muxes a lossless animated WebP
+    on close; frames are memory-mapped, never all held in RAM
+    """
+    def __init__(self, path):
+        self.path = path
+        self._spool = tempfile.TemporaryFile()
+        self._durations = []
+        self._shape = None
+
+    def write(self, frame, duration):
+        if self._shape is None:
+            self._shape = frame.shape
+        self._spool.write(np.ascontiguousarray(frame).tobytes())
+        self._durations.append(int(round(duration)))
+
+    def close(self):
+        try:
+            if not self._durations:
+                return
+            self._spool.flush()
+            height, width = self._shape
+            frames = np.memmap(self._spool, np.uint8, mode="r", shape=(len(self._durations), height, width))
+            images = [Image.frombuffer("L", (width, height), frames[i], "raw", "L", 0, 1)
+                      for i in range(len(frames))]
+            images[0].save(self.path, "WEBP", save_all=True, append_images=images[1:],
+                           duration=self._durations, loop=0, lossless=True)
+        finally:
+            self._spool.close()
+
+
+class VideoFrameWriter:
+    """
+    Streams frames into a video file with cv2.VideoWriter; the frame rate is
+    taken from the first frame's duration
+    """
+    def __init__(self, path):
+        self.path = path
+        self._fourcc = cv2.VideoWriter_fourcc(*VIDEO_FOURCC[os.path.splitext(path)[1].lower()])
+        self._writer = None
+
+    def write(self, frame, duration):
+        if self._writer is None:
+            height, width = frame.shape
+            self._writer = cv2.VideoWriter(self.path, self._fourcc, 1000.0 / duration, (width, height))
+            if not self._writer.isOpened():
+                raise ValueError(f"Cannot write video: {self.path}")
+        self._writer.write(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.release()
+
+
+def open_frame_writer(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".gif":
+        return GifFrameWriter(path)
+    if ext == ".webp":
+        return WebPFrameWriter(path)
+    if ext in VIDEO_FOURCC:
+        return VideoFrameWriter(path)
+    raise ValueError(f"Unsupported animation output: {ext or path}")
+
+
+def convert_animation(src, dst, params, workers=None, queue_size=DEFAULT_QUEUE_SIZE, on_progress=None,
+                      reuse_threshold=None, reuse_tile=DEFAULT_TILE, auto_detail=False):
+    """
+    Run every frame of src through the line-art pipeline and write dst.
+
+    on_progress(frames, frames_per_second) is called every PROGRESS_EVERY
+    frames from the calling thread. With reuse_threshold set, frames are
+    rendered one after another by a TemporalRenderer, reusing tiles that
+    changed by no more than the threshold (0 = exact). With auto_detail,
+    params.detail is picked from the first frame. Returns a summary dict.
+    """
+    workers = workers or os.cpu_count() or 1
+    frames = prefetch(iter_frames(src), queue_size)
+    if auto_detail:
+        first = next(frames, None)
+        if first is not None:
+            params = auto_params(first[0], params)
+            logging.info(f"Auto detail for {src}: {params.detail:.2f}")
+            frames = itertools.chain([first], frames)
+    writer = open_frame_writer(dst)
+    temporal = None
+    if reuse_threshold is not None:
+        # Each frame builds on the previous one, so frames render in sequence
+        temporal = TemporalRenderer(params, reuse_tile, reuse_threshold)
+        workers = 1
+
+    def render_frame(item):
+        gray, duration = item
+        if temporal:
+            return temporal.render(gray), duration
+        return render(gray, params), duration
+
+    count = 0
+    start = time.perf_counter()
+    try:
+        for edges, duration in ordered_map(render_frame, frames, workers):
+            writer.write(edges, duration)
+            count += 1
+            if count % PROGRESS_EVERY == 0:
+                fps = count / (time.perf_counter() - start)
+                logging.info(f"{count} frames converted ({fps:.1f} frames/s)")
+                if on_progress:
+                    on_progress(count, fps)
+    finally:
+        writer.close()
+
+    seconds = time.perf_counter() - start
+    fps = count / seconds if seconds else 0.0
+    logging.info(f"Converted {count} frames from {src} to {dst} in {seconds:.2f}s ({fps:.1f} frames/s)")
+    summary = {"frames": count, "seconds": seconds, "fps": fps, "detail": params.detail}
+    if temporal:
+        summary["reuse_fraction"] = temporal.reuse_fraction
+        logging.info(f"Reused {temporal.reused} of {temporal.tiles} tiles ({temporal.reuse_fraction:.1%})")
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py animate",
+                                     description="Convert an animated GIF/WebP or a video to line art.")
+    parser.add_argument("input")
+    parser.add_argument("output", help=f"Output file ({', '.join(OUTPUT_EXTENSIONS)})")
+    parser.add_argument("--detail", type=parse_detail, default=1.0,
+                        help=f"Detail level, or '{AUTO_DETAIL}' to pick one from the first frame")
+    parser.add_argument("--thickness", type=int, default=1)
+    parser.add_argument("--brightness", type=float, default=1.0)
+    parser.add_argument("--style", choices=STYLES, default="smooth")
+    parser.add_argument("--color-mode", choices=COLOR_MODES, default="black_on_white")
+    parser.add_argument("--workers", type=int, default=None, help="Render threads (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Decoded frames buffered ahead of the workers")
+    parser.add_argument("--reuse-threshold", type=int, default=None,
+                        help="Only re-render tiles whose pixels changed by more than this (0 = exact)")
+    parser.add_argument("--reuse-tile", type=int, default=DEFAULT_TILE, help="Tile size in pixels for --reuse-threshold")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    auto_detail = args.detail == AUTO_DETAIL
+    params = RenderParams(detail=1.0 if auto_detail else args.detail, thickness=args.thickness,
+                          brightness=args.brightness, style=args.style, color_mode=args.color_mode)
+    summary = convert_animation(args.input, args.output, params, workers=args.workers, queue_size=args.queue_size,
+                                reuse_threshold=args.reuse_threshold, reuse_tile=args.reuse_tile,
+                                auto_detail=auto_detail)
+    print(f"Converted {summary['frames']} frames in {summary['seconds']:.2f}s ({summary['fps']:.1f} frames/s)")
+    if "reuse_fraction" in summary:
+        print(f"Tiles reused: {summary['reuse_fraction']:.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
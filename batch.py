@@ -0,0 +1,318 @@
+"""
+Batch mode: convert whole directories of images across a process pool.
+
+Usage:
+    python main.py batch <in_dir> <out_dir> [--detail 1.0|auto] [--thickness 1]
+        [--brightness 1.0] [--style smooth] [--color-mode black_on_white]
+        [--format png] [--quality Best] [--transparent] [--workers N] [--tile-workers N]
+        [--force] [--cache-dir DIR | --no-cache] [--exact-resize] [--profile default]
+        [--vector]
+
+Each file goes through the same engine and export helpers as the GUI, so the
+saved output is pixel-identical to "Download Image" / "Download Transparent".
+Finished exports go into the same on-disk render cache as the GUI, so
+converting an image again with the same settings is a file copy.
+
+With --detail auto, each image gets its own detail level, picked from its
+gradient statistics (engine.auto_detail) instead of trial renders.
+
+With --vector, the line art is traced and saved as SVG (or vector PDF with
+--format pdf) instead of pixels; see vector.py.
+
+An output is skipped when it is newer than its source and was written with
+the same settings. The settings of every converted file are recorded in
+.artliner-batch.json in the output directory, so a re-run with different
+params re-converts without --force.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from PIL import Image
+
+import export
+from engine import AUTO_DETAIL, COLOR_MODES, STYLES, RenderParams, auto_params, parse_detail, render
+from export import (ENCODER_PROFILES, FORMATS, QUALITY_OPTIONS, exceeds_max_dimension, export_dpi, export_size,
+                    make_transparent,
+                    resize_for_export, save_image, save_transparent, use_tiled_export)
+from ingest import load_gray, probe_dpi, probe_size
+from rendercache import RenderCache, default_cache_dir
+from tiles import export_tiled
+from vector import export_vector
+
+# Settings of every converted file, keyed by its path relative to out_dir
+MANIFEST_NAME = ".artliner-batch.json"
+
+# Extensions accepted by the GUI upload dialog
+INPUT_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.gif', '.webp', '.ico', '.npy'}
+
+
+def iter_images(in_dir):
+    """
+    Lazily yield image paths under in_dir (recursive, no up-front listing)
+    """
+    stack = [in_dir]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in INPUT_EXTENSIONS:
+                    yield entry.path
+
+
+def output_format(fmt, transparent, vector=False):
+    """
+    Extension of the files written for these options
+    """
+    if vector:
+        return "pdf" if fmt == "pdf" else "svg"
+    return "png" if transparent else fmt
+
+
+def output_path_for(src, in_dir, out_dir, fmt, transparent, vector=False):
+    rel = os.path.relpath(src, in_dir)
+    return os.path.join(out_dir, os.path.splitext(rel)[0] + "." + output_format(fmt, transparent, vector))
+
+
+def settings_digest(params, fmt, quality, transparent, fast_resize=None, profile="default", auto_detail=False,
+                    vector=False):
+    """
+    Hash of every option that changes the written file. fast_resize=None
+    stands for export.FAST_RESIZE (ARTLINER_EXACT_RESIZE), as in
+    resize_for_export.
+    """
+    if fast_resize is None:
+        fast_resize = export.FAST_RESIZE
+    canonical = ["auto" if auto_detail else float(params.detail), int(params.thickness), float(params.brightness),
+                 params.style, params.color_mode, fmt, quality, bool(transparent), bool(fast_resize), profile,
+                 bool(vector)]
+    return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()
+
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(out_dir, manifest):
+    """
+    Replace the manifest atomically, so an interrupted run keeps the old one
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def is_up_to_date(src, dst, settings=None, recorded=None):
+    """
+    dst is newer than src and, when settings is given, the manifest recorded
+    the same settings for it
+    """
+    if settings is not None and recorded != settings:
+        return False
+    try:
+        return os.stat(dst).st_mtime >= os.stat(src).st_mtime
+    except FileNotFoundError:
+        return False
+
+
+_caches = {}
+
+
+def render_cache(cache_dir):
+    """
+    One RenderCache per directory per worker process
+    """
+    if cache_dir not in _caches:
+        _caches[cache_dir] = RenderCache(cache_dir)
+    return _caches[cache_dir]
+
+
+def convert_file(src, dst, params, fmt, quality, transparent, tile_workers=1, cache_dir=None, fast_resize=None,
+                 profile="default", auto_detail=False, vector=False):
+    """
+    Render and save one image; runs inside a pool worker. With auto_detail,
+    params.detail is replaced by the one picked for this image. With vector,
+    the traced line art is saved as SVG or vector PDF.
+
+    Returns (src, input bytes, seconds, error message or None).
+    """
+    start = time.perf_counter()
+    nbytes = 0
+    try:
+        nbytes = os.path.getsize(src)
+        width, height = probe_size(src)
+        out_fmt = output_format(fmt, transparent, vector)
+        tiled = not vector and use_tiled_export((width, height), (width, height), quality, out_fmt)
+        if not (vector or tiled) and exceeds_max_dimension(width, height):
+            raise ValueError("Resolution exceeds maximum supported image dimension.")
+        size = (width, height) if tiled else export_size(width, height, quality)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+        cache = render_cache(cache_dir) if cache_dir else None
+        cache_key = None
+        if cache:
+            cache_key = cache.key(src, params, size, quality, out_fmt, transparent, dst, fast_resize, profile,
+                                  auto_detail, vector)
+        encoder = ENCODER_PROFILES[profile]
+        if cache is None or not cache.fetch(cache_key, dst):
+            gray = load_gray(src)
+            if auto_detail:
+                params = auto_params(gray, params)
+                logging.info(f"Auto detail for {src}: {params.detail:.2f}")
+            if vector:
+                # Traced in strips on tile_workers threads; size only scales the drawing
+                export_vector(gray, params, dst, size, export_dpi(probe_dpi(src), width, size[0]),
+                              transparent=transparent, workers=tile_workers)
+            elif tiled:
+                # Very large images stream to disk strip by strip
+                export_tiled(gray, params, dst, fmt, transparent=transparent, workers=tile_workers, profile=encoder)
+            else:
+                processed = Image.fromarray(render(gray, params))
+                if transparent:
+                    img_rgba = make_transparent(processed, params.color_mode)
+                    save_transparent(resize_for_export(img_rgba, size, fast_resize), dst, encoder)
+                else:
+                    dpi = export_dpi(probe_dpi(src), width, size[0])
+                    save_image(resize_for_export(processed, size, fast_resize), dst, fmt, encoder, dpi)
+            if cache:
+                cache.store(cache_key, dst)
+        error = None
+    except Exception as e:
+        error = str(e)
+    return src, nbytes, time.perf_counter() - start, error
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return float(np.percentile(values, pct))
+
+
+def run_batch(in_dir, out_dir, params, fmt="png", quality="Best", transparent=False,
+              workers=None, force=False, tile_workers=1, cache_dir=None, fast_resize=None, profile="default",
+              auto_detail=False, vector=False):
+    """
+    Convert every image under in_dir and return a summary dict
+    """
+    workers = workers or os.cpu_count() or 1
+    # Keep a bounded number of tasks in flight so huge directories stream
+    max_pending = workers * 4
+    latencies = []
+    total_bytes = 0
+    skipped = 0
+    failed = 0
+    start = time.perf_counter()
+
+    settings = settings_digest(params, fmt, quality, transparent, fast_resize, profile, auto_detail, vector)
+    manifest = load_manifest(out_dir)
+
+    def collect(done, pending):
+        nonlocal total_bytes, failed
+        for future in done:
+            rel = pending.pop(future)
+            src, nbytes, elapsed, error = future.result()
+            if error:
+                failed += 1
+                logging.error(f"Failed to convert {src}: {error}")
+                continue
+            manifest[rel] = settings
+            latencies.append(elapsed)
+            total_bytes += nbytes
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        try:
+            for src in iter_images(in_dir):
+                dst = output_path_for(src, in_dir, out_dir, fmt, transparent, vector)
+                rel = os.path.relpath(dst, out_dir)
+                if not force and is_up_to_date(src, dst, settings, manifest.get(rel)):
+                    skipped += 1
+                    continue
+                manifest.pop(rel, None)  # Recorded again once the new output is written
+                future = pool.submit(convert_file, src, dst, params, fmt, quality, transparent, tile_workers,
+                                     cache_dir, fast_resize, profile, auto_detail, vector)
+                pending[future] = rel
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done, pending)
+            done, _ = wait(pending)
+            collect(done, pending)
+        finally:
+            save_manifest(out_dir, manifest)
+
+    wall = time.perf_counter() - start
+    converted = len(latencies)
+    return {
+        "converted": converted,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": wall,
+        "images_per_s": converted / wall if wall else 0.0,
+        "mb_per_s": total_bytes / 1e6 / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py batch", description="Convert a directory of images to line art.")
+    parser.add_argument("in_dir")
+    parser.add_argument("out_dir")
+    parser.add_argument("--detail", type=parse_detail, default=1.0,
+                        help=f"Detail level, or '{AUTO_DETAIL}' to pick one per image")
+    parser.add_argument("--thickness", type=int, default=1)
+    parser.add_argument("--brightness", type=float, default=1.0)
+    parser.add_argument("--style", choices=STYLES, default="smooth")
+    parser.add_argument("--color-mode", choices=COLOR_MODES, default="black_on_white")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--quality", choices=QUALITY_OPTIONS, default="Best")
+    parser.add_argument("--transparent", action="store_true", help="Write transparent PNGs")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--tile-workers", type=int, default=1,
+                        help="Threads per image for very large images rendered in strips")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-convert files that are newer than their source and have the same settings")
+    parser.add_argument("--cache-dir", default=None, help="Render cache directory (default: the per-user cache)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the render cache")
+    parser.add_argument("--profile", choices=list(ENCODER_PROFILES), default="default",
+                        help="Encoder profile: compact = smallest files, fast = quickest writes")
+    parser.add_argument("--vector", action="store_true",
+                        help="Trace the line art and write SVG (vector PDF with --format pdf)")
+    parser.add_argument("--exact-resize", action="store_true",
+                        help="Always resample with LANCZOS instead of the fast resize paths")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    auto_detail = args.detail == AUTO_DETAIL
+    params = RenderParams(detail=1.0 if auto_detail else args.detail, thickness=args.thickness,
+                          brightness=args.brightness, style=args.style, color_mode=args.color_mode)
+    summary = run_batch(args.in_dir, args.out_dir, params, fmt=args.format, quality=args.quality,
+                        transparent=args.transparent, workers=args.workers, force=args.force,
+                        tile_workers=args.tile_workers,
+                        cache_dir=None if args.no_cache else args.cache_dir or default_cache_dir(),
+                        fast_resize=False if args.exact_resize else None, profile=args.profile,
+                        auto_detail=auto_detail, vector=args.vector)
+    print(f"Converted {summary['converted']} images ({summary['skipped']} up to date, "
+          f"{summary['failed']} failed) in {summary['seconds']:.2f}s")
+    print(f"Throughput: {summary['images_per_s']:.2f} images/s, {summary['mb_per_s']:.2f} MB/s")
+    print(f"Latency per image: p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
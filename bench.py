@@ -0,0 +1,467 @@
+"""
+Benchmark suite for the line-art pipeline, exports and the transparency path.
+
+Runs headless (no Tk). For every image size it times:
+
+* render/<size>/<style>/<color mode>/t<thickness>  - engine.render
+* export/<size>/<format>/<quality>[/<profile>]     - resize + save, as "Download Image"
+* transparent/<size>/<quality>                     - as "Download Transparent"
+
+and records wall time, CPU time, peak RSS growth and peak traced allocations.
+It also records startup/<module>: the cumulative `python -X importtime` of the
+launcher (everything loaded before the window appears), the GUI module (loaded
+on the warm-up thread) and batch mode. The launcher must not import any of
+DEFERRED_MODULES; the run fails if it does. verify/temporal checks that
+temporal.TemporalRenderer matches engine.render on every frame of synthetic
+sequences, and fails the run otherwise. verify/server starts the render
+service on localhost in a thread and fails the run unless POST /render returns
+the bytes save_image/save_transparent write with the same settings.
+Results are written as JSON (bench/results.json next to this file unless
+--out is given; bench/ is git-ignored); pass --baseline to compare against an
+earlier run and exit non-zero when any case got slower than the threshold.
+
+Usage:
+    python bench.py --sizes 1,4,16 --out bench/baseline.json
+    python bench.py --sizes 1,4,16 --baseline bench/baseline.json --threshold 0.15
+    python bench.py --fixtures photos/ --thicknesses all
+    python bench.py --only startup --repeat 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from urllib.parse import urlencode
+
+import cv2
+import numpy as np
+import psutil
+from PIL import Image
+
+import export
+from engine import COLOR_MODES, STYLES, RenderParams, render
+from export import (ENCODER_PROFILES, FORMATS, QUALITY_OPTIONS, export_dpi, export_size, make_transparent, resize_for_export, save_image,
+                    save_transparent)
+from ingest import load_gray, probe_dpi
+from server import serve
+from temporal import verify_temporal
+
+# Regressions smaller than this (seconds) are treated as noise
+NOISE_FLOOR_S = 0.005
+
+RSS_SAMPLE_INTERVAL = 0.005
+
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench", "results.json")
+
+STARTUP_MODULES = ("main", "gui", "batch")
+
+# Never imported by the launcher itself: tkinter loads when the GUI starts,
+# the rest on its warm-up thread
+DEFERRED_MODULES = ("cv2", "numpy", "psutil", "PIL", "tkinter")
+
+# verify/temporal: incremental rendering must match engine.render on every frame
+TEMPORAL_PARAMS = (RenderParams(), RenderParams(detail=0.5, thickness=5, style="clean", color_mode="white_on_black"))
+TEMPORAL_TILES = (16, 64)
+TEMPORAL_SEEDS = 8
+
+# verify/server: /render query parameters, each compared with the GUI download
+SERVER_CASES = (
+    {},
+    {"format": "tiff", "profile": "compact", "style": "clean"},
+    {"format": "jpg", "quality": "Good", "thickness": 3},
+    {"transparent": "1", "color_mode": "white_on_black", "profile": "fast"},
+)
+SERVER_START_TIMEOUT = 30.0
+
+
+def synthetic_image(megapixels, seed=0):
+    """
+    Deterministic 4:3 grayscale test image with shapes, gradients and noise
+    """
+    width = int(round((megapixels * 1e6 * 4 / 3) ** 0.5))
+    height = int(round(megapixels * 1e6 / width))
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(40, 200, width).astype(np.uint8)
+    img = np.repeat(gradient[np.newaxis, :], height, axis=0)
+    for _ in range(60):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(max(2, width // 80), max(3, width // 6)))
+        cv2.circle(img, center, radius, int(rng.integers(0, 256)), -1)
+    for _ in range(40):
+        p1 = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        p2 = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        cv2.line(img, p1, p2, int(rng.integers(0, 256)), max(1, width // 500))
+    noise = rng.integers(0, 24, (height, width), dtype=np.uint8)
+    return cv2.add(img, noise)
+
+
+class _RSSSampler:
+    """
+    Sample this process's RSS in the background and keep the maximum
+    """
+    def __init__(self):
+        self.process = psutil.Process()
+        self.peak = self.process.memory_info().rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self.start = self.process.memory_info().rss
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def measure(fn, repeat):
+    """
+    Run fn `repeat` times for timing, then once more under tracemalloc
+    """
+    walls = []
+    cpus = []
+    with _RSSSampler() as rss:
+        for _ in range(repeat):
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            fn()
+            cpus.append(time.process_time() - cpu)
+            walls.append(time.perf_counter() - wall)
+
+    tracemalloc.start()
+    fn()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "wall_s": min(walls),
+        "wall_median_s": float(np.median(walls)),
+        "cpu_s": min(cpus),
+        "peak_rss_mb": (rss.peak - rss.start) / 2**20,
+        "alloc_peak_mb": alloc_peak / 2**20,
+    }
+
+
+def import_time(module):
+    """
+    Return (seconds, loaded module names) for importing module in a fresh
+    interpreter, from python -X importtime
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+                            check=True)
+    seconds = 0.0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        loaded.add(name)
+        if name == module:
+            seconds = int(cumulative) / 1e6
+    return seconds, loaded
+
+
+def measure_startup(module, repeat):
+    times = []
+    for _ in range(repeat):
+        seconds, loaded = import_time(module)
+        times.append(seconds)
+    return {"wall_s": min(times), "wall_median_s": float(np.median(times)), "loaded": sorted(loaded)}
+
+
+def iter_cases(images, thicknesses, formats, qualities, tmp_dir, profiles=("default",)):
+    """
+    Yield (name, callable) for every benchmark case
+    """
+    for label, gray in images:
+        for style in STYLES:
+            for color_mode in COLOR_MODES:
+                for thickness in thicknesses:
+                    params = RenderParams(thickness=thickness, style=style, color_mode=color_mode)
+                    yield (f"render/{label}/{style}/{color_mode}/t{thickness}",
+                           lambda gray=gray, params=params: render(gray, params))
+
+        processed = Image.fromarray(render(gray, RenderParams()))
+        width, height = processed.size
+        for fmt in formats:
+            for quality in qualities:
+                for profile in profiles:
+                    path = os.path.join(tmp_dir, f"bench.{fmt}")
+                    suffix = "" if profile == "default" else f"/{profile}"
+
+                    def export_case(fmt=fmt, quality=quality, path=path, profile=ENCODER_PROFILES[profile]):
+                        size = export_size(width, height, quality)
+                        save_image(resize_for_export(processed, size), path, fmt, profile)
+                    yield f"export/{label}/{fmt}/{quality}{suffix}", export_case
+
+        for quality in qualities:
+            path = os.path.join(tmp_dir, "bench_transparent.png")
+
+            def transparent_case(quality=quality, path=path):
+                img_rgba = make_transparent(processed, "black_on_white")
+                save_transparent(resize_for_export(img_rgba, export_size(width, height, quality)), path)
+            yield f"transparent/{label}/{quality}", transparent_case
+
+
+def synthetic_sequence(seed=0, frames=12, width=256, height=192):
+    """
+    Deterministic frames of faint polylines whose strong anchors and small
+    cuts come and go in several places at once, plus moving noise patches
+    """
+    rng = np.random.default_rng(seed)
+    base = np.full((height, width), 100, np.uint8)
+    polylines = [rng.integers(0, (width, height), (4, 2)).astype(np.int32) for _ in range(6)]
+    cv2.polylines(base, polylines, False, 118, 1)
+    patches = [(rng.integers(0, (width - 16, height - 16)), rng.integers(-5, 6, 2),
+                rng.integers(0, 256, (16, 16), dtype=np.uint8)) for _ in range(3)]
+    for index in range(frames):
+        img = base.copy()
+        for (x, y), (dx, dy), patch in patches:
+            x, y = (x + dx * index) % (width - 16), (y + dy * index) % (height - 16)
+            img[y:y + 16, x:x + 16] = patch
+        for _ in range(rng.integers(0, 4)):
+            points = polylines[rng.integers(len(polylines))]
+            a, b = points[rng.integers(3)], points[rng.integers(1, 4)]
+            x, y = (a + (b - a) * rng.random()).astype(int)
+            cv2.circle(img, (int(x), int(y)), 1, int(rng.choice([40, 160])), -1)
+        for _ in range(rng.integers(0, 4)):
+            x, y = rng.integers(0, (width, height))
+            img[y:y + 3, x:x + 3] = int(rng.choice([100, 118]))
+        yield img
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def expected_download(source, case, path):
+    """
+    Bytes "Download Image" / "Download Transparent" save for a SERVER_CASES entry
+    """
+    params = RenderParams(thickness=int(case.get("thickness", 1)), style=case.get("style", "smooth"),
+                          color_mode=case.get("color_mode", "black_on_white"))
+    fmt = case.get("format", "png")
+    profile = ENCODER_PROFILES[case.get("profile", "default")]
+    gray = load_gray(source)
+    size = export_size(gray.shape[1], gray.shape[0], case.get("quality", "Best"))
+    processed = Image.fromarray(render(gray, params))
+    if case.get("transparent"):
+        save_transparent(resize_for_export(make_transparent(processed, params.color_mode), size), path, profile)
+    else:
+        dpi = export_dpi(probe_dpi(source), gray.shape[1], size[0])
+        save_image(resize_for_export(processed, size), path, fmt, profile, dpi)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def verify_server(image, tmp_dir):
+    """
+    Run the render service on a localhost thread and return the SERVER_CASES
+    whose /render response differs from the GUI download
+    """
+    source = os.path.join(tmp_dir, "server_source.png")
+    Image.fromarray(image).save(source)
+    with open(source, "rb") as f:
+        data = f.read()
+    port = free_port()
+    loop = asyncio.new_event_loop()
+    stop = asyncio.Event()
+    thread = threading.Thread(target=loop.run_until_complete,
+                              args=(serve("127.0.0.1", port, stop=stop, workers=1),), daemon=True)
+    thread.start()
+    mismatches = []
+    try:
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/health").close()
+                break
+            except urllib.error.URLError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+        for case in SERVER_CASES:
+            url = f"http://127.0.0.1:{port}/render?{urlencode(case)}"
+            with urllib.request.urlopen(urllib.request.Request(url, data=data, method="POST")) as response:
+                served = response.read()
+            path = os.path.join(tmp_dir, "server_expected." + ("png" if case.get("transparent") else
+                                                               case.get("format", "png")))
+            if served != expected_download(source, case, path):
+                mismatches.append(urlencode(case) or "defaults")
+    finally:
+        loop.call_soon_threadsafe(stop.set)
+        thread.join()
+        loop.close()
+    return mismatches
+
+
+def load_images(sizes, fixtures):
+    images = [(f"{size:g}MP", synthetic_image(size)) for size in sizes]
+    if fixtures:
+        for name in sorted(os.listdir(fixtures)):
+            path = os.path.join(fixtures, name)
+            if os.path.isfile(path):
+                try:
+                    images.append((name, np.ascontiguousarray(load_gray(path))))
+                except Exception as e:
+                    print(f"Skipping fixture {name}: {e}", file=sys.stderr)
+    return images
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv_threads": cv2.getNumThreads(),
+        "fast_resize": export.FAST_RESIZE,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Return a list of (name, old, new, ratio) for cases slower than the threshold
+    """
+    old = {case["name"]: case for case in baseline["results"]}
+    regressions = []
+    for case in results:
+        before = old.get(case["name"])
+        if not before:
+            continue
+        ratio = case["wall_s"] / before["wall_s"] if before["wall_s"] else float("inf")
+        if ratio > 1 + threshold and case["wall_s"] - before["wall_s"] > NOISE_FLOOR_S:
+            regressions.append((case["name"], before["wall_s"], case["wall_s"], ratio))
+    return regressions
+
+
+def parse_list(text, cast, all_values=None):
+    if text == "all" and all_values is not None:
+        return list(all_values)
+    return [cast(item) for item in text.split(",") if item]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the line-art pipeline and exports.")
+    parser.add_argument("--sizes", default="1,4", help="Synthetic image sizes in megapixels (e.g. 1,10,50,200)")
+    parser.add_argument("--fixtures", help="Directory of extra images to benchmark")
+    parser.add_argument("--thicknesses", default="1,3,10", help="Thickness values, or 'all' for 1-10")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="Export formats to time")
+    parser.add_argument("--qualities", default=",".join(QUALITY_OPTIONS), help="Quality profiles to time")
+    parser.add_argument("--profiles", default="default", help="Encoder profiles to time, or 'all'")
+    parser.add_argument("--only", help="Only run cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (best is reported)")
+    parser.add_argument("--exact-resize", action="store_true",
+                        help="Time the plain LANCZOS export path instead of the fast resize paths")
+    parser.add_argument("--threads", type=int, help="cv2.setNumThreads value for reproducible runs")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="Where to write the JSON results (default: bench/results.json)")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown before failing (0.15 = 15%%)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+    if args.exact_resize:
+        export.FAST_RESIZE = False
+
+    images = load_images(parse_list(args.sizes, float), args.fixtures)
+    thicknesses = parse_list(args.thicknesses, int, range(1, 11))
+    formats = parse_list(args.formats, str)
+    qualities = parse_list(args.qualities, str)
+    profiles = parse_list(args.profiles, str, ENCODER_PROFILES)
+
+    results = []
+    eager = []
+    for module in STARTUP_MODULES:
+        name = f"startup/{module}"
+        if args.only and args.only not in name:
+            continue
+        case = {"name": name, **measure_startup(module, args.repeat)}
+        loaded = case.pop("loaded")
+        if module == "main":
+            eager = [m for m in DEFERRED_MODULES if m in loaded]
+        results.append(case)
+        print(f"{name:55s} {case['wall_s'] * 1000:9.1f} ms  median {case['wall_median_s'] * 1000:9.1f} ms")
+
+    mismatches = []
+    if not args.only or args.only in "verify/temporal":
+        for params in TEMPORAL_PARAMS:
+            for tile in TEMPORAL_TILES:
+                for seed in range(TEMPORAL_SEEDS):
+                    if not verify_temporal(synthetic_sequence(seed), params, tile):
+                        mismatches.append(f"{params} tile {tile} seed {seed}")
+        print(f"{'verify/temporal':55s} {'FAILED' if mismatches else 'ok'}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server_mismatches = []
+        if not args.only or args.only in "verify/server":
+            server_mismatches = verify_server(synthetic_image(0.05), tmp_dir)
+            print(f"{'verify/server':55s} {'FAILED' if server_mismatches else 'ok'}")
+
+        for name, fn in iter_cases(images, thicknesses, formats, qualities, tmp_dir, profiles):
+            if args.only and args.only not in name:
+                continue
+            case = {"name": name, **measure(fn, args.repeat)}
+            results.append(case)
+            print(f"{name:55s} {case['wall_s'] * 1000:9.1f} ms  cpu {case['cpu_s'] * 1000:9.1f} ms  "
+                  f"rss +{case['peak_rss_mb']:7.1f} MB  alloc {case['alloc_peak_mb']:7.1f} MB")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.out}")
+
+    status = 0
+    for mismatch in mismatches:
+        print(f"MISMATCH incremental render differs from engine.render: {mismatch}")
+        status = 1
+    for mismatch in server_mismatches:
+        print(f"MISMATCH /render differs from the GUI download: {mismatch}")
+        status = 1
+    if eager:
+        print(f"STARTUP the launcher imports {', '.join(eager)} before the window appears")
+        status = 1
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+In-memory cache of intermediate pipeline stages.
+
+StageCache is a thread-safe LRU keyed by (stage, key) and bounded by the total
+number of bytes held, not by entry count, since a single full-resolution stage
+can be hundreds of megabytes. Cached arrays are marked read-only because they
+are shared between renders.
+"""
+import threading
+from collections import OrderedDict
+
+from instrument import record_cache, stage as timed_stage
+
+# Default memory budget for one image's cached stages
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class StageCache:
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def get_or_compute(self, stage, key, compute):
+        """
+        Return the cached array for (stage, key), computing and storing it on a miss
+        """
+        full_key = (stage,) + tuple(key)
+        with self._lock:
+            value = self._entries.get(full_key)
+            if value is not None:
+                self._entries.move_to_end(full_key)
+                self.hits[stage] = self.hits.get(stage, 0) + 1
+                record_cache(stage, True)
+                return value
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+        record_cache(stage, False)
+
+        # Compute outside the lock so other workers are not blocked
+        with timed_stage(stage):
+            value = compute()
+        value.flags.writeable = False
+        self._store(full_key, value)
+        return value
+
+    def get(self, stage, key):
+        """
+        Return the cached array or None, without touching the counters
+        """
+        with self._lock:
+            return self._entries.get((stage,) + tuple(key))
+
+    def _store(self, full_key, value):
+        size = value.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if full_key in self._entries:
+                return
+            self._entries[full_key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """
+        Hit/miss counters per stage plus current memory use
+        """
+        with self._lock:
+            stages = sorted(set(self.hits) | set(self.misses))
+            return {
+                "stages": {stage: {"hits": self.hits.get(stage, 0), "misses": self.misses.get(stage, 0)}
+                           for stage in stages},
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+            }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,135 @@
+"""
+Display layer between rendered images and the Tk canvases.
+
+A CanvasView owns one canvas image item and one ImageTk.PhotoImage. The first
+time an image has to be shown smaller than it is, a pyramid of 2x box-reduced
+levels is built; every redraw then picks the smallest level that still covers
+the canvas and resamples only that. When the canvas size and image are
+unchanged, the redraw is skipped. When the displayed size is unchanged, the
+pixels are pasted into the existing PhotoImage instead of allocating a new one.
+Previews rendered at canvas size are pasted straight from the array-backed
+image, with no intermediate copy.
+"""
+import math
+
+from PIL import Image, ImageTk
+
+from instrument import stage
+
+# Smallest pyramid level worth keeping (pixels on the long side)
+MIN_LEVEL_SIZE = 64
+
+
+def fit_size(size, box):
+    """
+    Size of `size` scaled down to fit in `box`, rounded like Image.thumbnail
+    """
+    width, height = size
+    x, y = box
+    if x >= width and y >= height:
+        return size
+
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = width / height
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    return x, y
+
+
+def build_pyramid(img):
+    """
+    [img, img / 2, img / 4, ...] down to MIN_LEVEL_SIZE, using box reduction
+    """
+    levels = [img]
+    while max(levels[-1].size) // 2 >= MIN_LEVEL_SIZE and min(levels[-1].size) >= 2:
+        levels.append(levels[-1].reduce(2))
+    return levels
+
+
+def pick_level(levels, size):
+    """
+    Smallest level that is at least `size` in both dimensions
+    """
+    for level in reversed(levels):
+        if level.width >= size[0] and level.height >= size[1]:
+            return level
+    return levels[0]
+
+
+class CanvasView:
+    def __init__(self, canvas, size_fn):
+        self.canvas = canvas
+        self.size_fn = size_fn  # canvas -> (width, height)
+        self.levels = None
+        self.photo = None
+        self.item = None
+        self._mode = None
+        self._pyramid_built = False
+        self._generation = 0    # Bumped for every new image
+        self._shown = None      # (generation, canvas size) currently on screen
+        self.stats = {"drawn": 0, "skipped": 0, "pasted": 0, "allocated": 0}
+
+    def set_image(self, img):
+        """
+        Show a new image (the pyramid is built lazily, on first downscale)
+        """
+        self.levels = [img]
+        self._pyramid_built = False
+        self._generation += 1
+        self.refresh()
+
+    def refresh(self):
+        """
+        Redraw for the current canvas size; a no-op if nothing changed
+        """
+        if self.levels is None:
+            return
+        canvas_size = self.size_fn(self.canvas)
+        key = (self._generation, canvas_size)
+        if key == self._shown:
+            self.stats["skipped"] += 1
+            return
+
+        source = self.levels[0]
+        size = fit_size(source.size, canvas_size)
+        with stage("thumbnail"):
+            if size != source.size:
+                if not self._pyramid_built:
+                    self.levels = build_pyramid(source)
+                    self._pyramid_built = True
+                level = pick_level(self.levels, size)
+                img = level if level.size == size else level.resize(size, Image.LANCZOS)
+            else:
+                # Already canvas-sized (previews): display it as is
+                img = source
+        with stage("photoimage"):
+            self._paste(img)
+        self._place(canvas_size)
+        self._shown = key
+        self.stats["drawn"] += 1
+
+    def _paste(self, img):
+        mode = img.mode if img.mode in ("1", "L", "RGB", "RGBA") else "RGB"
+        if self.photo is not None and self.photo.width() == img.width and self.photo.height() == img.height \
+                and self._mode == mode:
+            self.photo.paste(img)
+            self.stats["pasted"] += 1
+            return
+        self.photo = ImageTk.PhotoImage(mode, img.size)
+        self._mode = mode
+        self.photo.paste(img)
+        self.stats["allocated"] += 1
+        if self.item is not None:
+            self.canvas.itemconfigure(self.item, image=self.photo)
+
+    def _place(self, canvas_size):
+        x, y = canvas_size[0] // 2, canvas_size[1] // 2
+        if self.item is None:
+            self.item = self.canvas.create_image(x, y, anchor="center", image=self.photo)
+            self.canvas.tag_lower(self.item)  # Overlays stay on top
+        else:
+            self.canvas.coords(self.item, x, y)
@@ -0,0 +1,392 @@
+"""
+Headless line-art engine.
+
+This module holds the Canny -> dilate -> style -> invert pipeline that used to
+live inside OhBotArtApp.process_image. It only depends on OpenCV and NumPy, so
+it can be imported and called from workers, servers and scripts without a Tk
+root.
+"""
+import logging
+import threading
+from dataclasses import dataclass, replace
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from instrument import stage
+
+COLOR_MODES = ("black_on_white", "white_on_black")
+
+# Intermediate buffers larger than this are not kept between renders
+SCRATCH_MAX_BYTES = 64 * 1024 * 1024
+
+# Detail option value that derives the Canny thresholds from the image
+AUTO_DETAIL = "auto"
+# Range of the detail slider; auto detail is clamped to it
+DETAIL_RANGE = (0.5, 5.0)
+# Auto detail puts the high threshold where this fraction of pixels has a
+# stronger gradient (the fixed thresholds do about that on typical photos)
+AUTO_STRONG_FRACTION = 0.05
+# Auto detail statistics use the brightness rounded to this many decimals,
+# everywhere, so the GUI can cache them per slider step and still pick the
+# same detail as batch, animate and the render service
+AUTO_DETAIL_BRIGHTNESS_DIGITS = 2
+# Largest L1 Sobel gradient magnitude of an 8-bit image (4 * 255 * 2)
+MAX_GRADIENT = 2040
+
+
+@dataclass(frozen=True)
+class RenderParams:
+    """
+    Immutable set of pipeline parameters (hashable, picklable)
+    """
+    detail: float = 1.0
+    thickness: int = 1
+    brightness: float = 1.0
+    style: str = "smooth"
+    color_mode: str = "black_on_white"
+
+    def __post_init__(self):
+        if self.detail <= 0:
+            raise ValueError(f"detail must be positive, got {self.detail}")
+        if self.style not in STYLE_STAGES:
+            raise ValueError(f"Unknown style: {self.style}")
+        if self.color_mode not in COLOR_MODES:
+            raise ValueError(f"Unknown color mode: {self.color_mode}")
+        # Sliders hand us floats; the kernel size is always a whole number
+        object.__setattr__(self, "thickness", int(self.thickness))
+
+    @property
+    def thresholds(self):
+        # Map the detail slider to Canny thresholds
+        return int(50 / self.detail), int(150 / self.detail)
+
+
+def parse_detail(value):
+    """
+    Command-line/query type for detail: a positive number or "auto"
+    """
+    if str(value).strip().lower() == AUTO_DETAIL:
+        return AUTO_DETAIL
+    detail = float(value)
+    if detail <= 0:
+        raise ValueError(f"detail must be positive or '{AUTO_DETAIL}', got {value}")
+    return detail
+
+
+def to_gray(img_np: np.ndarray) -> np.ndarray:
+    """
+    Convert an RGB (or already single-channel) array to 8-bit grayscale
+    """
+    if img_np.ndim == 2:
+        return img_np
+    if img_np.ndim == 3 and img_np.shape[2] == 1:
+        return img_np[:, :, 0]
+    return cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
+
+
+def scaled_kernel(size, scale, minimum=1):
+    """
+    Scale a kernel size for a render at `scale` x the source resolution
+    """
+    if scale == 1.0:
+        return size
+    return max(minimum, int(round(size * scale)))
+
+
+def odd_kernel(size, scale, minimum=1):
+    # Gaussian and adaptive-threshold kernels must be odd
+    scaled = scaled_kernel(size, scale, minimum)
+    return scaled if scaled % 2 else scaled + 1
+
+
+def make_proxy(gray: np.ndarray, max_width: int, max_height: int):
+    """
+    Downscale gray to fit max_width x max_height; returns (proxy, scale)
+    """
+    height, width = gray.shape[:2]
+    scale = min(max_width / width, max_height / height, 1.0)
+    if scale >= 1.0:
+        return gray, 1.0
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA), scale
+
+
+_scratch = threading.local()
+
+
+def scratch(name, shape):
+    """
+    Per-thread uint8 buffer for an intermediate stage, reused across renders
+    """
+    buffers = _scratch.__dict__
+    buf = buffers.get(name)
+    if buf is None or buf.shape != shape:
+        buf = np.empty(shape, np.uint8)
+        if buf.nbytes <= SCRATCH_MAX_BYTES:
+            buffers[name] = buf
+    return buf
+
+
+def adjust_brightness(gray, brightness, dst=None):
+    # Adjust brightness on the grayscale image before edge detection
+    if brightness != 1.0:
+        return cv2.convertScaleAbs(gray, dst=dst, alpha=brightness)
+    return gray
+
+
+def detect_edges(img_cv, thresholds, dst=None):
+    lower_threshold, upper_threshold = thresholds
+    return cv2.Canny(img_cv, lower_threshold, upper_threshold, edges=dst)
+
+
+def gradient_magnitude(img_cv):
+    """
+    L1 Sobel gradient magnitude (uint16), the quantity Canny thresholds
+    """
+    dx = cv2.Sobel(img_cv, cv2.CV_16S, 1, 0, ksize=3, borderType=cv2.BORDER_REPLICATE)
+    dy = cv2.Sobel(img_cv, cv2.CV_16S, 0, 1, ksize=3, borderType=cv2.BORDER_REPLICATE)
+    return cv2.add(cv2.absdiff(dx, 0), cv2.absdiff(dy, 0), dtype=cv2.CV_16U)
+
+
+def gradient_histogram(gray, brightness=1.0):
+    """
+    Pixel counts per gradient magnitude (0..MAX_GRADIENT) of the
+    brightness-adjusted image, in one pass; the statistics auto detail uses.
+    brightness is rounded to AUTO_DETAIL_BRIGHTNESS_DIGITS.
+    """
+    img_cv = adjust_brightness(gray, round(brightness, AUTO_DETAIL_BRIGHTNESS_DIGITS))
+    magnitude = gradient_magnitude(img_cv)
+    return cv2.calcHist([magnitude], [0], None, [MAX_GRADIENT + 1], [0, MAX_GRADIENT + 1]).ravel()
+
+
+def auto_detail(histogram):
+    """
+    Detail whose high threshold leaves AUTO_STRONG_FRACTION of the pixels
+    above it, clamped to DETAIL_RANGE
+    """
+    total = histogram.sum()
+    if not total:
+        return DETAIL_RANGE[1]
+    high = int(np.searchsorted(np.cumsum(histogram), total * (1 - AUTO_STRONG_FRACTION)))
+    low_detail, high_detail = DETAIL_RANGE
+    # thresholds maps detail d to a high threshold of 150 / d
+    return float(np.clip(150 / max(high, 1), low_detail, high_detail))
+
+
+def auto_params(gray, params, histogram=None):
+    """
+    params with the detail chosen by auto_detail for gray; pass a cached
+    gradient_histogram to skip the image pass
+    """
+    if histogram is None:
+        histogram = gradient_histogram(gray, params.brightness)
+    return replace(params, detail=auto_detail(histogram))
+
+
+def dilate_edges(edges, kernel_size, dst=None):
+    # Adjust thickness
+    if kernel_size > 1:
+        kernel = np.ones((kernel_size, kernel_size), np.uint8)
+        return cv2.dilate(edges, kernel, dst=dst, iterations=1)
+    return edges
+
+
+@dataclass(frozen=True)
+class StyleStage:
+    """
+    A style applied to the binary (0/255) dilated edges.
+
+    apply(edges, scale, dst) returns the styled image (into dst when given).
+    reach is how many pixels the kernel looks past each output pixel at scale
+    1, which tiled and incremental renders use as halo. inverted, when set,
+    returns bitwise_not(apply(...)) in the same pass. An identity stage changes
+    nothing on binary input and is skipped. A binary stage always returns
+    0/255 images, so 1-bit exports can be streamed without looking first.
+    """
+    apply: Callable
+    reach: int
+    inverted: Optional[Callable] = None
+    identity: bool = False
+    binary: bool = False
+
+
+STYLE_STAGES = {}
+
+
+def register_style(name, apply, reach, inverted=None, identity=False, binary=False):
+    """
+    Add a style; it is accepted by RenderParams from then on
+    """
+    STYLE_STAGES[name] = StyleStage(apply, reach, inverted, identity, binary or identity)
+
+
+def _smooth(edges, scale, dst=None):
+    blur_size = odd_kernel(5, scale)
+    if blur_size > 1:
+        return cv2.GaussianBlur(edges, (blur_size, blur_size), 0, dst=dst)
+    return edges
+
+
+def _sharp(edges, scale, dst=None):
+    # The 3x3 sharpen kernel (9 at the centre, -1 around it) maps binary
+    # edges to themselves: an edge pixel gives at least 9*255 - 8*255 and
+    # saturates to 255, a background pixel gives at most 0
+    return edges
+
+
+def _clean(edges, scale, dst=None, threshold_type=cv2.THRESH_BINARY):
+    # Adaptive thresholding for a clean, binary effect
+    return cv2.adaptiveThreshold(edges, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 threshold_type, odd_kernel(11, scale, minimum=3), 2, dst=dst)
+
+
+def _clean_inverted(edges, scale, dst=None):
+    return _clean(edges, scale, dst, cv2.THRESH_BINARY_INV)
+
+
+register_style("smooth", _smooth, reach=2)
+register_style("sharp", _sharp, reach=0, identity=True)
+register_style("clean", _clean, reach=5, inverted=_clean_inverted, binary=True)
+
+# Built-in styles, in the order the GUI and CLIs list them
+STYLES = tuple(STYLE_STAGES)
+
+
+def renders_binary(params):
+    """
+    True when every render with params is pure black and white
+    """
+    return STYLE_STAGES[params.style].binary
+
+
+def apply_style(edges, style, scale=1.0, dst=None):
+    return STYLE_STAGES[style].apply(edges, scale, dst)
+
+
+def apply_color_mode(edges, color_mode, dst=None):
+    if color_mode == "white_on_black":
+        return cv2.bitwise_not(edges, dst=dst)
+    return edges
+
+
+def finish_edges(edges, params, scale=1.0, owned=False):
+    """
+    Dilation, style and color mode on binary Canny edges, in as few passes as
+    possible.
+
+    Identity steps are dropped, inversion is folded into the style when the
+    style has an inverted form, and intermediates go to per-thread scratch
+    buffers, so only the returned array is allocated. edges is never modified
+    unless owned is true; with no steps left it is returned as is.
+    """
+    style = STYLE_STAGES[params.style]
+    invert = params.color_mode == "white_on_black"
+    kernel_size = scaled_kernel(params.thickness, scale)
+
+    steps = []
+    if kernel_size > 1:
+        steps.append(("dilate", lambda src, dst: dilate_edges(src, kernel_size, dst)))
+    if invert and style.inverted:
+        steps.append(("style", lambda src, dst: style.inverted(src, scale, dst)))
+        invert = False
+    elif not style.identity:
+        steps.append(("style", lambda src, dst: style.apply(src, scale, dst)))
+
+    if not steps:
+        if not invert:
+            return edges
+        with stage("invert"):
+            return cv2.bitwise_not(edges, dst=edges if owned else None)
+
+    for index, (name, step) in enumerate(steps):
+        last = index == len(steps) - 1
+        with stage(name):
+            edges = step(edges, None if last else scratch(name, edges.shape))
+    if invert:
+        # The last step's output is a fresh array: invert it in place
+        with stage("invert"):
+            cv2.bitwise_not(edges, dst=edges)
+    return edges
+
+
+def render(gray: np.ndarray, params: RenderParams, scale: float = 1.0) -> np.ndarray:
+    """
+    Run the line-art pipeline on a grayscale array and return the 8-bit result.
+
+    `scale` is the size of `gray` relative to the full-resolution source. For
+    preview proxies (scale < 1) the pixel-sized kernels are shrunk to match, so
+    the preview looks like a thumbnail of the final render. Canny thresholds are
+    left alone: they act on per-pixel intensity steps, which an area downscale
+    preserves for the hard edges line art is made of.
+    """
+    with stage("brightness"):
+        dst = scratch("brightness", gray.shape[:2]) if params.brightness != 1.0 else None
+        img_cv = adjust_brightness(gray, params.brightness, dst)
+    with stage("canny"):
+        edges = detect_edges(img_cv, params.thresholds)
+    edges = finish_edges(edges, params, scale, owned=True)
+    logging.debug(f"Rendered {gray.shape[1]}x{gray.shape[0]} at scale {scale} with {params}")
+    return edges
+
+
+def render_at_size(gray: np.ndarray, params: RenderParams, size) -> np.ndarray:
+    """
+    Render line art directly at `size` (an up-scale of `gray`).
+
+    Interpolating finished line art blurs it; instead the grayscale source is
+    up-sampled and the pipeline runs at the target resolution with kernels
+    scaled to match. Up-sampling spreads each intensity step over several
+    pixels, which weakens the gradients Canny sees; dividing the thresholds by
+    sqrt(scale) keeps close to the same set of edges as the native render.
+    """
+    width, height = size
+    scale = ((width / gray.shape[1]) * (height / gray.shape[0])) ** 0.5
+    img_cv = cv2.resize(adjust_brightness(gray, params.brightness), (width, height),
+                        interpolation=cv2.INTER_LINEAR)
+    edges = detect_edges(img_cv, tuple(t / scale ** 0.5 for t in params.thresholds))
+    logging.debug(f"Rendered {gray.shape[1]}x{gray.shape[0]} at {width}x{height} with {params}")
+    return finish_edges(edges, params, scale, owned=True)
+
+
+def edges_cached(gray: np.ndarray, params: RenderParams, cache, key=(), scale: float = 1.0):
+    """
+    Canny edges of gray through the brightness and Canny stages of `cache`;
+    returns (edges, cache key of the Canny stage)
+    """
+    brightness_key = key + (scale, params.brightness)
+    img_cv = gray
+    if params.brightness != 1.0:
+        img_cv = cache.get_or_compute("brightness", brightness_key,
+                                      lambda: adjust_brightness(gray, params.brightness))
+
+    canny_key = brightness_key + params.thresholds
+    return cache.get_or_compute("canny", canny_key, lambda: detect_edges(img_cv, params.thresholds)), canny_key
+
+
+def render_cached(gray: np.ndarray, params: RenderParams, cache, key=(), scale: float = 1.0) -> np.ndarray:
+    """
+    Same as render(), but every intermediate stage is looked up in `cache`
+    (a cache.StageCache) first.
+
+    Each stage is keyed by `key` (identifying `gray`) plus only the parameters
+    that affect it, so changing a late parameter such as the color mode reuses
+    the cached edges and recomputes just the stages after it.
+    """
+    edges, canny_key = edges_cached(gray, params, cache, key, scale)
+
+    kernel_size = scaled_kernel(params.thickness, scale)
+    dilate_key = canny_key + (kernel_size,)
+    if kernel_size > 1:
+        canny_edges = edges
+        edges = cache.get_or_compute("dilate", dilate_key, lambda: dilate_edges(canny_edges, kernel_size))
+
+    if not STYLE_STAGES[params.style].identity:
+        style_key = dilate_key + (params.style,)
+        dilated = edges
+        edges = cache.get_or_compute("style", style_key, lambda: apply_style(dilated, params.style, scale))
+
+    # Inversion is a single cheap pass over the cached styled result
+    with stage("invert"):
+        return apply_color_mode(edges, params.color_mode)
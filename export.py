@@ -0,0 +1,295 @@
+"""
+Export helpers shared by the GUI download buttons and batch mode.
+
+Keeping the resize, transparency and save steps here guarantees that batch
+output is pixel-identical to what the GUI writes.
+"""
+import io
+import logging
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Largest dimension the encoders we use can handle
+MAX_DIMENSION = 65500
+
+QUALITY_OPTIONS = ["Good", "Best", "Highest Quality"]
+FORMATS = ['bmp', 'jpeg', 'jpg', 'png', 'tiff', 'pdf']
+
+# Native-size exports at least this large are rendered in strips and streamed
+# to disk (see tiles.export_tiled) instead of being built in memory
+TILED_EXPORT_PIXELS = 100_000_000
+TILED_FORMATS = ('png', 'tiff')
+
+# Skip resampling for native-size exports, use box reduction for exact integer
+# downscales and render up-scales at the target size. Set ARTLINER_EXACT_RESIZE=1
+# (or pass fast=False) to always resample with LANCZOS, e.g. for comparisons.
+FAST_RESIZE = os.environ.get("ARTLINER_EXACT_RESIZE") != "1"
+
+# Page resolution for PDF exports with the default profile or a source without DPI
+PDF_RESOLUTION = 100.0
+
+# TIFF tag for the LZW/Deflate predictor; 2 = horizontal differencing
+TIFF_PREDICTOR_TAG = 317
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """
+    How exports are encoded. The "default" profile writes the same files as
+    before profiles existed.
+    """
+    bilevel: bool = False              # 1-bit output when every pixel is pure black or white
+    png_compress_level: int = 6        # zlib level 0-9
+    png_strategy: int = 0              # zlib strategy: 0 default, 1 filtered, 2 Huffman only, 3 RLE, 4 fixed
+    tiff_compression: Optional[str] = None  # "tiff_lzw" or "tiff_adobe_deflate"; 1-bit TIFFs use CCITT G4
+    tiff_predictor: bool = False       # Horizontal differencing for LZW/Deflate
+    jpeg_quality: Optional[int] = None  # None keeps Pillow's default (75)
+    jpeg_optimize: bool = False        # Optimized Huffman tables (smaller, lossless)
+    opencv: bool = False               # Encode grayscale PNG/JPEG with cv2.imencode, which releases the GIL
+
+
+ENCODER_PROFILES = {
+    "default": EncoderProfile(),
+    # Smallest files: 1-bit where possible, maximum zlib effort
+    "compact": EncoderProfile(bilevel=True, png_compress_level=9, tiff_compression="tiff_adobe_deflate",
+                              tiff_predictor=True, jpeg_optimize=True),
+    # Fastest writes: 1-bit where possible, light zlib with RLE, OpenCV encoders
+    "fast": EncoderProfile(bilevel=True, png_compress_level=1, png_strategy=3, tiff_compression="tiff_lzw",
+                           tiff_predictor=True, opencv=True),
+}
+
+
+def exceeds_max_dimension(width, height):
+    return width > MAX_DIMENSION or height > MAX_DIMENSION
+
+
+def use_tiled_export(source_size, requested_size, quality, fmt):
+    """
+    True when an export should stream through the tiled renderer
+    """
+    return (quality != "Good"
+            and tuple(requested_size) == tuple(source_size)
+            and fmt in TILED_FORMATS
+            and requested_size[0] * requested_size[1] >= TILED_EXPORT_PIXELS)
+
+
+def export_size(width, height, quality):
+    """
+    Return the final (width, height) for the requested quality profile
+    """
+    if quality == "Good":
+        scale_factor = 0.5
+    elif quality == "Highest Quality":
+        # Determine max size based on available memory
+        import psutil
+
+        mem = psutil.virtual_memory()
+        max_pixels = mem.available // 10  # Use a fraction of available memory
+        max_dimension = int(np.sqrt(max_pixels))
+        width = min(width, max_dimension)
+        height = min(height, max_dimension)
+        scale_factor = 1.0
+    else:
+        scale_factor = 1.0
+    return int(width * scale_factor), int(height * scale_factor)
+
+
+def transparency_mask(gray, color_mode):
+    """
+    Return a uint8 mask (255 = line, 0 = background) for an 8-bit edge array
+    """
+    if color_mode == "black_on_white":
+        # Lines are dark: anything below 128 is kept
+        _, mask = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
+    else:
+        # Lines are light: anything above 128 is kept
+        _, mask = cv2.threshold(gray, 128, 255, cv2.THRESH_BINARY)
+    return mask
+
+
+def make_transparent(img, color_mode):
+    """
+    Return an RGBA copy of the line art with the background made transparent.
+
+    Line pixels become opaque black (or white for "white_on_black"); everything
+    else becomes fully transparent. Built directly from the pixel array.
+    """
+    if img.mode == "L":
+        mask = transparency_mask(np.asarray(img), color_mode)
+    else:
+        # A pixel counts as a line only if every channel passes the test
+        rgb = np.asarray(img.convert("RGB"))
+        masks = [transparency_mask(np.ascontiguousarray(rgb[:, :, c]), color_mode) for c in range(3)]
+        mask = cv2.bitwise_and(cv2.bitwise_and(masks[0], masks[1]), masks[2])
+
+    return Image.fromarray(rgba_from_mask(mask, color_mode), "RGBA")
+
+
+def rgba_from_mask(mask, color_mode):
+    """
+    Build the RGBA array for a transparency mask
+    """
+    # Color of every pixel: line color where opaque, background color where transparent
+    value = cv2.bitwise_not(mask) if color_mode == "black_on_white" else mask
+    return cv2.merge([value, value, value, mask])
+
+
+def renders_at_target(source_size, size, fast=None):
+    """
+    True when an export is an up-scale that should be rendered at the target
+    size (engine.render_at_size) rather than resized
+    """
+    if fast is None:
+        fast = FAST_RESIZE
+    return fast and size[0] > source_size[0] and size[1] > source_size[1]
+
+
+def resize_for_export(img, size, fast=None):
+    if fast is None:
+        fast = FAST_RESIZE
+    size = tuple(size)
+    if fast:
+        if size == img.size:
+            return img
+        # Exact integer reductions (e.g. "Good" quality on even sizes) are a box average
+        factor = img.width // size[0] if size[0] else 0
+        if factor > 1 and img.size == (size[0] * factor, size[1] * factor):
+            return img.reduce(factor)
+    return img.resize(size, Image.LANCZOS)
+
+
+def export_dpi(source_dpi, source_width, width):
+    """
+    DPI of an export `width` pixels wide from a source with source_dpi, or None
+    """
+    if not source_dpi:
+        return None
+    return source_dpi * width / source_width
+
+
+def to_bilevel(img):
+    """
+    Return a 1-bit copy of an 8-bit image whose pixels are all 0 or 255,
+    otherwise the image itself
+    """
+    if img.mode != "L":
+        return img
+    if cv2.countNonZero(cv2.inRange(np.asarray(img), 1, 254)):
+        return img
+    return img.convert("1", dither=Image.Dither.NONE)
+
+
+def _write_bytes(output, data):
+    if hasattr(output, "write"):
+        output.write(data)
+    else:
+        with open(output, "wb") as f:
+            f.write(data)
+
+
+def _encode(img, output, pil_format, profile, dpi):
+    """
+    Write img to output (a path or file object). pil_format=None lets Pillow
+    pick the format from the file extension, as save_image always has.
+    """
+    profile = profile or ENCODER_PROFILES["default"]
+    kind = pil_format or Image.registered_extensions().get(os.path.splitext(output)[1].lower())
+    if profile.bilevel and kind in ("PNG", "TIFF", "BMP", "PDF"):
+        img = to_bilevel(img)
+
+    options = {}
+    if kind == "PDF":
+        # The default profile keeps the fixed page resolution it always had
+        use_dpi = dpi and profile != ENCODER_PROFILES["default"]
+        options["resolution"] = float(dpi if use_dpi else PDF_RESOLUTION)
+    elif kind == "PNG":
+        if profile.opencv and img.mode in ("L", "1"):
+            flags = [cv2.IMWRITE_PNG_COMPRESSION, profile.png_compress_level,
+                     cv2.IMWRITE_PNG_STRATEGY, profile.png_strategy,
+                     cv2.IMWRITE_PNG_BILEVEL, int(img.mode == "1")]
+            _write_bytes(output, cv2.imencode(".png", np.asarray(img.convert("L")), flags)[1].tobytes())
+            return
+        if profile != ENCODER_PROFILES["default"]:
+            options["compress_level"] = profile.png_compress_level
+            if profile.png_strategy:
+                options["compress_type"] = profile.png_strategy
+    elif kind == "TIFF":
+        if img.mode == "1":
+            options["compression"] = "group4"
+        elif profile.tiff_compression:
+            options["compression"] = profile.tiff_compression
+            if profile.tiff_predictor:
+                options["tiffinfo"] = {TIFF_PREDICTOR_TAG: 2}
+    elif kind == "JPEG":
+        if profile.opencv and img.mode == "L":
+            flags = [cv2.IMWRITE_JPEG_QUALITY, profile.jpeg_quality or 75,
+                     cv2.IMWRITE_JPEG_OPTIMIZE, int(profile.jpeg_optimize)]
+            _write_bytes(output, cv2.imencode(".jpg", np.asarray(img), flags)[1].tobytes())
+            return
+        if profile.jpeg_quality is not None:
+            options["quality"] = profile.jpeg_quality
+        if profile.jpeg_optimize:
+            options["optimize"] = True
+    img.save(output, pil_format, **options)
+
+
+def save_image(img, output_path, fmt, profile=None, dpi=None):
+    # Handle PDF format
+    _encode(img, output_path, "PDF" if fmt == 'pdf' else None, profile, dpi)
+    logging.debug(f"Saved {output_path} ({img.width}x{img.height})")
+
+
+def two_color_palette(img):
+    """
+    Return a 1-bit palette image equivalent to a make_transparent() result,
+    or None if img has partially transparent or mixed-color pixels
+    """
+    r, g, b, a = cv2.split(np.asarray(img))
+    if (cv2.countNonZero(cv2.inRange(a, 1, 254)) or cv2.countNonZero(cv2.absdiff(r, g))
+            or cv2.countNonZero(cv2.absdiff(r, b))):
+        return None
+    if not cv2.countNonZero(cv2.absdiff(r, a)):
+        line = 255  # White lines
+    elif not cv2.countNonZero(cv2.absdiff(r, cv2.bitwise_not(a))):
+        line = 0    # Black lines
+    else:
+        return None
+    # Index 0 is the transparent background, index 1 the opaque line color
+    pal = Image.fromarray(cv2.threshold(a, 0, 1, cv2.THRESH_BINARY)[1], "L").convert("P")
+    pal.putpalette([255 - line] * 3 + [line] * 3)
+    return pal
+
+
+def save_transparent(img, output_path, profile=None):
+    profile = profile or ENCODER_PROFILES["default"]
+    if profile == ENCODER_PROFILES["default"]:
+        img.save(output_path, "PNG")
+        return
+    options = {"compress_level": profile.png_compress_level}
+    if profile.png_strategy:
+        options["compress_type"] = profile.png_strategy
+    pal = two_color_palette(img) if profile.bilevel and img.mode == "RGBA" else None
+    if pal is not None:
+        pal.save(output_path, "PNG", transparency=0, bits=1, **options)
+    else:
+        img.save(output_path, "PNG", **options)
+
+
+def encode_image(img, fmt, profile=None, dpi=None):
+    """
+    Return the bytes save_image() would write for a file with extension fmt
+    """
+    buf = io.BytesIO()
+    _encode(img, buf, "PDF" if fmt == 'pdf' else Image.registered_extensions()["." + fmt], profile, dpi)
+    return buf.getvalue()
+
+
+def encode_transparent(img, profile=None):
+    buf = io.BytesIO()
+    save_transparent(img, buf, profile)
+    return buf.getvalue()
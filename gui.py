@@ -0,0 +1,760 @@
+"""
+The Tk application window.
+
+Imported by main.py on a warm-up thread while the window comes up, so the
+heavy dependencies below (cv2, numpy, psutil, the export codecs) never delay
+the first frame. Logging is configured by main.py.
+"""
+import tkinter as tk
+from tkinter import filedialog, messagebox, ttk
+from PIL import Image
+import logging
+import threading
+import os
+from dataclasses import replace
+from engine import DETAIL_RANGE, RenderParams, render_at_size
+import instrument
+from instrument import Trace, activate
+from display import CanvasView
+from ingest import load_display_image, probe_dpi
+from preview import PreviewSource
+from rendercache import RenderCache
+from scheduler import RenderScheduler
+from export import (ENCODER_PROFILES, FORMATS, MAX_DIMENSION, QUALITY_OPTIONS, TILED_EXPORT_PIXELS,
+                    exceeds_max_dimension, export_dpi, export_size,
+                    make_transparent, renders_at_target, resize_for_export, save_image, save_transparent,
+                    use_tiled_export)
+from tiles import export_tiled
+from animation import OUTPUT_EXTENSIONS as ANIMATION_OUTPUTS, convert_animation
+from vector import export_vector
+
+# How often the Tk main loop collects finished preview renders
+RENDER_POLL_MS = 15
+# Idle time (seconds) before the full-resolution render is prepared for export
+FULL_RENDER_DELAY = 0.75
+# Quiet period after the last <Configure> event before the canvases are redrawn
+RESIZE_DEBOUNCE_MS = 80
+
+class OhBotArtApp:
+    def __init__(self, root, show_perf=False, profiler=None):
+        self.root = root
+        self.root.title("OhBot Art - Futuristic Image Processor")
+        self.root.configure(bg="#f0f0f0")  # Lighter background color
+
+        # Open the window maximized by default
+        self.root.state('zoomed')  # For Windows
+
+        # Set up style
+        self.style = ttk.Style()
+        self.style.theme_use('clam')
+        self.style.configure('.', background='#f0f0f0', foreground='#000000', font=('Helvetica', 10))
+        self.style.configure('TButton', background='#e0e0e0', foreground='#000000', font=('Helvetica', 10))
+        self.style.configure('TLabel', background='#f0f0f0', foreground='#000000', font=('Helvetica', 10))
+        self.style.configure('TEntry', background='#ffffff', foreground='#000000', font=('Helvetica', 10))
+        self.style.configure('Horizontal.TScale', background='#f0f0f0')
+        self.style.configure('TRadiobutton', background='#f0f0f0', foreground='#000000', font=('Helvetica', 10))
+        self.style.configure('TMenubutton', background='#e0e0e0', foreground='#000000', font=('Helvetica', 10))
+        self.style.configure('TFrame', background='#f0f0f0')
+
+        self.filepath = None
+        self.image = None             # Screen-sized RGB copy of the original
+        self.image_size = None        # (width, height) of the full-resolution original
+        self.source = None            # PreviewSource for the current image
+        self.preview_image = None     # Canvas-sized render shown on screen
+        self.processed_image = None   # Full-resolution render used for export
+        self.processed_params = None  # RenderParams that produced processed_image
+        self.requested_params = None  # RenderParams last sent to the export worker
+        self.preview_size = None      # Canvas size the last preview was requested for
+        self.resize_job = None        # Pending debounced redraw after a window resize
+        self.original_aspect_ratio = None
+        self.render_cache = RenderCache()  # Finished exports on disk, shared with batch mode
+        self.show_perf = show_perf    # Draw per-stage preview timings over the processed image (F12)
+
+        # Background workers: previews render on a canvas-sized proxy, and the
+        # full-resolution render is prepared once the settings stop changing.
+        # Results come back on the main thread via poll_renders.
+        render_preview, render_full = self.render_preview, self.render_full
+        if profiler:
+            render_preview, render_full = profiler.wrap(render_preview), profiler.wrap(render_full)
+        self.scheduler = RenderScheduler(render_preview, self.on_render_done, self.on_render_error)
+        self.export_scheduler = RenderScheduler(render_full, self.on_full_render_done,
+                                                debounce=FULL_RENDER_DELAY)
+        self.poll_renders()
+
+        # UI layout
+        self.create_ui()
+        logging.info("Application initialized.")
+
+    def create_ui(self):
+        # Main frame
+        self.main_frame = ttk.Frame(self.root)
+        self.main_frame.pack(fill='both', expand=True)
+
+        # Configure grid
+        self.main_frame.columnconfigure(0, weight=1)
+        self.main_frame.columnconfigure(1, weight=1)
+        self.main_frame.rowconfigure(0, weight=0)  # File upload section
+        self.main_frame.rowconfigure(1, weight=1)  # Image previews
+        self.main_frame.rowconfigure(2, weight=0)  # Controls
+        self.main_frame.rowconfigure(3, weight=0)  # Download options
+
+        # File upload section
+        file_frame = ttk.Frame(self.main_frame)
+        file_frame.grid(row=0, column=0, columnspan=2, pady=5, sticky='we')
+        file_frame.columnconfigure(0, weight=1)
+        upload_btn = ttk.Button(file_frame, text="Upload Image", command=self.upload_image)
+        upload_btn.pack(side=tk.LEFT, padx=5)
+        upload_btn_ttp = CreateToolTip(upload_btn, "Click to upload an image.")
+
+        # Original and Processed Image views
+        self.image_frame = ttk.Frame(self.main_frame)
+        self.image_frame.grid(row=1, column=0, columnspan=2, sticky='nsew')
+        self.image_frame.columnconfigure(0, weight=1)
+        self.image_frame.columnconfigure(1, weight=1)
+        self.image_frame.rowconfigure(1, weight=1)
+
+        # Original Image
+        original_header = ttk.Label(self.image_frame, text="Original Image", font=('Helvetica', 12, 'bold'))
+        original_header.grid(row=0, column=0, pady=5)
+        self.original_canvas = tk.Canvas(self.image_frame, bg="#d0d0d0", highlightthickness=0)
+        self.original_canvas.grid(row=1, column=0, padx=10, pady=5, sticky='nsew')
+        self.original_canvas.view = CanvasView(self.original_canvas, self.canvas_size)
+
+        # Processed Image
+        processed_header = ttk.Label(self.image_frame, text="Processed Image", font=('Helvetica', 12, 'bold'))
+        processed_header.grid(row=0, column=1, pady=5)
+        self.processed_canvas = tk.Canvas(self.image_frame, bg="#d0d0d0", highlightthickness=0)
+        self.processed_canvas.grid(row=1, column=1, padx=10, pady=5, sticky='nsew')
+        self.processed_canvas.view = CanvasView(self.processed_canvas, self.canvas_size)
+
+        # Controls Frame
+        controls_frame = ttk.Frame(self.main_frame)
+        controls_frame.grid(row=2, column=0, columnspan=2, pady=5, sticky='we')
+        controls_frame.columnconfigure(0, weight=1)
+        controls_frame.columnconfigure(1, weight=1)
+        controls_frame.columnconfigure(2, weight=1)
+        controls_frame.columnconfigure(3, weight=1)  # Added for Reset button alignment
+
+        # Sliders for detail, thickness, brightness
+        options_frame = ttk.LabelFrame(controls_frame, text="Adjustments")
+        options_frame.grid(row=0, column=0, padx=10, sticky='we')
+        options_frame.columnconfigure(1, weight=1)
+
+        self.detail_var = tk.DoubleVar(value=1.0)
+        detail_label = ttk.Label(options_frame, text="Details")
+        detail_label.grid(row=0, column=0, padx=5, pady=5, sticky='e')
+        self.detail_scale = ttk.Scale(options_frame, from_=DETAIL_RANGE[0], to=DETAIL_RANGE[1], orient="horizontal", variable=self.detail_var, command=self.update_image)
+        self.detail_scale.grid(row=0, column=1, padx=5, sticky='we')
+        CreateToolTip(self.detail_scale, "Adjust the level of detail in edge detection.")
+
+        self.auto_detail_var = tk.BooleanVar(value=False)
+        auto_detail_cb = ttk.Checkbutton(options_frame, text="Auto", variable=self.auto_detail_var, command=self.toggle_auto_detail)
+        auto_detail_cb.grid(row=0, column=2, padx=5, sticky='w')
+        CreateToolTip(auto_detail_cb, "Pick the detail level from the image's edge statistics.")
+
+        self.thickness_var = tk.IntVar(value=1)
+        thickness_label = ttk.Label(options_frame, text="Thickness")
+        thickness_label.grid(row=1, column=0, padx=5, pady=5, sticky='e')
+        thickness_scale = ttk.Scale(options_frame, from_=1, to=10, orient="horizontal", variable=self.thickness_var, command=self.update_image)
+        thickness_scale.grid(row=1, column=1, padx=5, sticky='we')
+        CreateToolTip(thickness_scale, "Adjust the thickness of the edges.")
+
+        self.brightness_var = tk.DoubleVar(value=1.0)
+        brightness_label = ttk.Label(options_frame, text="Brightness")
+        brightness_label.grid(row=2, column=0, padx=5, pady=5, sticky='e')
+        brightness_scale = ttk.Scale(options_frame, from_=0.5, to=3, orient="horizontal", variable=self.brightness_var, command=self.update_image)
+        brightness_scale.grid(row=2, column=1, padx=5, sticky='we')
+        CreateToolTip(brightness_scale, "Adjust the brightness of the image.")
+
+        # Style options
+        style_frame = ttk.LabelFrame(controls_frame, text="Style")
+        style_frame.grid(row=0, column=1, padx=10, sticky='we')
+        style_frame.columnconfigure(0, weight=1)
+
+        self.style_var = tk.StringVar(value="smooth")
+        smooth_rb = ttk.Radiobutton(style_frame, text="Smooth", variable=self.style_var, value="smooth", command=self.update_image)
+        smooth_rb.grid(row=0, column=0, padx=5, pady=5, sticky='w')
+        CreateToolTip(smooth_rb, "Apply a smooth effect to the image.")
+
+        sharp_rb = ttk.Radiobutton(style_frame, text="Sharp", variable=self.style_var, value="sharp", command=self.update_image)
+        sharp_rb.grid(row=1, column=0, padx=5, pady=5, sticky='w')
+        CreateToolTip(sharp_rb, "Apply a sharp effect to the image.")
+
+        clean_rb = ttk.Radiobutton(style_frame, text="Clean", variable=self.style_var, value="clean", command=self.update_image)
+        clean_rb.grid(row=2, column=0, padx=5, pady=5, sticky='w')
+        CreateToolTip(clean_rb, "Apply a clean, binary effect to the image.")
+
+        # Color Mode options
+        color_mode_frame = ttk.LabelFrame(controls_frame, text="Color Mode")
+        color_mode_frame.grid(row=0, column=2, padx=10, sticky='we')
+        color_mode_frame.columnconfigure(0, weight=1)
+
+        self.color_mode_var = tk.StringVar(value="black_on_white")
+        bow_rb = ttk.Radiobutton(color_mode_frame, text="Black on White", variable=self.color_mode_var, value="black_on_white", command=self.update_image)
+        bow_rb.grid(row=0, column=0, padx=5, pady=5, sticky='w')
+        CreateToolTip(bow_rb, "Black lines on white background.")
+
+        wob_rb = ttk.Radiobutton(color_mode_frame, text="White on Black", variable=self.color_mode_var, value="white_on_black", command=self.update_image)
+        wob_rb.grid(row=1, column=0, padx=5, pady=5, sticky='w')
+        CreateToolTip(wob_rb, "White lines on black background.")
+
+        # Reset Button
+        reset_btn = ttk.Button(controls_frame, text="Reset", command=self.reset_settings)
+        reset_btn.grid(row=0, column=3, padx=10, pady=5)
+        CreateToolTip(reset_btn, "Reset all settings to default.")
+
+        # Download options
+        download_frame = ttk.Frame(self.main_frame)
+        download_frame.grid(row=3, column=0, columnspan=2, pady=5, sticky='we')
+        download_frame.columnconfigure(1, weight=1)
+        download_frame.columnconfigure(3, weight=1)
+        download_frame.columnconfigure(4, weight=1)  # Added for new button
+
+        # Width and Height inputs
+        ttk.Label(download_frame, text="Width (pixels)").grid(row=0, column=0, padx=5, pady=5, sticky='e')
+        self.width_var = tk.IntVar()
+        width_entry = ttk.Entry(download_frame, textvariable=self.width_var, width=10)
+        width_entry.grid(row=0, column=1, padx=5, pady=5, sticky='w')
+        CreateToolTip(width_entry, "Set the width for the saved image.")
+
+        ttk.Label(download_frame, text="Height (pixels)").grid(row=0, column=2, padx=5, pady=5, sticky='e')
+        self.height_var = tk.IntVar()
+        height_entry = ttk.Entry(download_frame, textvariable=self.height_var, width=10)
+        height_entry.grid(row=0, column=3, padx=5, pady=5, sticky='w')
+        CreateToolTip(height_entry, "Set the height for the saved image.")
+
+        # Maintain Aspect Ratio Checkbox
+        self.maintain_aspect_var = tk.BooleanVar(value=True)
+        aspect_check = ttk.Checkbutton(download_frame, text="Maintain Aspect Ratio", variable=self.maintain_aspect_var)
+        aspect_check.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky='w')
+        CreateToolTip(aspect_check, "Toggle to maintain or ignore the original aspect ratio.")
+
+        # Bind width and height variable changes
+        self.width_var.trace_add('write', self.width_changed)
+        self.height_var.trace_add('write', self.height_changed)
+
+        # Quality options
+        ttk.Label(download_frame, text="Quality").grid(row=1, column=2, padx=5, pady=5, sticky='e')
+        self.quality_var = tk.StringVar(value="Best")
+        self.quality_menu = ttk.Combobox(download_frame, textvariable=self.quality_var, values=QUALITY_OPTIONS, state='readonly')
+        self.quality_menu.grid(row=1, column=3, padx=5, pady=5, sticky='w')
+        CreateToolTip(self.quality_menu, "Select the quality for the saved image.")
+
+        ttk.Label(download_frame, text="Format").grid(row=2, column=0, padx=5, pady=5, sticky='e')
+        self.format_var = tk.StringVar(value="png")
+
+        # Image formats
+        self.format_menu = ttk.Combobox(download_frame, textvariable=self.format_var, values=FORMATS, state='readonly')
+        self.format_menu.grid(row=2, column=1, padx=5, pady=5, sticky='w')
+        CreateToolTip(self.format_menu, "Select the format to save the image.")
+
+        # Encoder profile
+        ttk.Label(download_frame, text="Encoding").grid(row=3, column=0, padx=5, pady=5, sticky='e')
+        self.profile_var = tk.StringVar(value="default")
+        self.profile_menu = ttk.Combobox(download_frame, textvariable=self.profile_var,
+                                         values=list(ENCODER_PROFILES), state='readonly')
+        self.profile_menu.grid(row=3, column=1, padx=5, pady=5, sticky='w')
+        CreateToolTip(self.profile_menu, "Compact: smallest files (1-bit where possible). Fast: quickest writes.")
+
+        # Existing Download Button
+        download_btn = ttk.Button(download_frame, text="Download Image", command=self.download_image)
+        download_btn.grid(row=2, column=3, padx=10, pady=5)
+        CreateToolTip(download_btn, "Click to download the processed image.")
+
+        # **New Button: Download Transparent Image**
+        download_transparent_btn = ttk.Button(download_frame, text="Download Transparent", command=self.download_image_transparent)
+        download_transparent_btn.grid(row=3, column=3, padx=10, pady=5)
+        CreateToolTip(download_transparent_btn, "Download the image with a transparent background.")
+
+        convert_animation_btn = ttk.Button(download_frame, text="Convert Animation/Video",
+                                           command=self.convert_animation_file)
+        convert_animation_btn.grid(row=4, column=3, padx=10, pady=5)
+        CreateToolTip(convert_animation_btn, "Convert every frame of a GIF, WebP or video with the current settings.")
+
+        download_vector_btn = ttk.Button(download_frame, text="Download Vector", command=self.download_vector)
+        download_vector_btn.grid(row=5, column=3, padx=10, pady=5)
+        CreateToolTip(download_vector_btn, "Trace the line art and save it as SVG or PDF paths (any print size).")
+
+        # Bind the configure event to adjust the canvases
+        self.root.bind('<Configure>', self.resize_canvases)
+        self.root.bind('<F12>', self.toggle_perf_overlay)
+
+    def upload_image(self):
+        filepath = filedialog.askopenfilename(filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp *.tif *.tiff *.gif *.webp *.ico *.npy")])
+        if filepath:
+            self.filepath = filepath
+            # Results for the previous image are no longer wanted
+            self.scheduler.cancel()
+            self.export_scheduler.cancel()
+            # The pipeline decodes straight to grayscale; only a screen-sized
+            # RGB copy is kept for the "Original Image" view
+            self.source = PreviewSource.from_path(filepath)
+            self.image_size = self.source.size
+            screen_size = (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+            self.image = load_display_image(filepath, screen_size)
+            self.processed_image = None
+            self.processed_params = None
+            self.requested_params = None
+            width, height = self.image_size
+            self.original_aspect_ratio = width / height
+            self.show_image(self.original_canvas, self.image)
+            self.width_var.set(width)
+            self.height_var.set(height)
+            self.update_image()
+            logging.info(f"Image uploaded: {filepath}")
+
+    def canvas_size(self, canvas):
+        canvas.update_idletasks()  # Ensure canvas dimensions are up-to-date
+        canvas_width = canvas.winfo_width()
+        canvas_height = canvas.winfo_height()
+        if canvas_width < 10 or canvas_height < 10:
+            canvas_width = int(self.root.winfo_width() * 0.45)
+            canvas_height = int(self.root.winfo_height() * 0.6)
+        return max(canvas_width, 1), max(canvas_height, 1)
+
+    def show_image(self, canvas, img):
+        # The canvas's view fits the image to the canvas and reuses its PhotoImage
+        canvas.view.set_image(img)
+
+    def update_image(self, *args):
+        if self.image:
+            # Snapshot the settings on the main thread; bursts are coalesced by the schedulers
+            params = self.current_params()
+            self.request_preview(params)
+            if params != self.requested_params:
+                self.requested_params = params
+                self.export_scheduler.submit((self.source, params, self.auto_detail_var.get()))
+
+    def request_preview(self, params):
+        self.preview_size = self.canvas_size(self.processed_canvas)
+        self.scheduler.submit((self.source, params, self.preview_size, self.auto_detail_var.get()))
+
+    def toggle_auto_detail(self):
+        # The slider shows the automatic pick but cannot be dragged meanwhile
+        self.detail_scale.state(["disabled"] if self.auto_detail_var.get() else ["!disabled"])
+        self.update_image()
+
+    def current_params(self):
+        # Snapshot the Tk variables into an immutable engine parameter set.
+        # With Auto on, the detail comes from the image's gradient statistics
+        # if they are cached; otherwise the render and export workers pick it
+        params = RenderParams(
+            detail=self.detail_var.get(),
+            thickness=self.thickness_var.get(),
+            brightness=self.brightness_var.get(),
+            style=self.style_var.get(),
+            color_mode=self.color_mode_var.get(),
+        )
+        if self.auto_detail_var.get() and self.source is not None:
+            detail = self.source.auto_detail(params.brightness, compute=False)
+            if detail is not None:
+                self.detail_var.set(detail)
+                params = replace(params, detail=detail)
+        return params
+
+    @staticmethod
+    def resolve_auto_detail(source, params, auto):
+        # Runs on a worker thread: the first call per image and brightness
+        # reads the gradients of the full-resolution image
+        return replace(params, detail=source.auto_detail(params.brightness)) if auto else params
+
+    def render_preview(self, job):
+        # Runs on the render worker thread; must not touch Tk
+        source, params, (max_width, max_height), auto = job
+        params = self.resolve_auto_detail(source, params, auto)
+        # The trace is finished on the main thread once the preview is on screen
+        trace = Trace("preview", source_size=list(source.size), canvas_size=[max_width, max_height])
+        with activate(trace):
+            edges = source.render_preview(params, max_width, max_height)
+        trace.fields["preview_size"] = [edges.shape[1], edges.shape[0]]
+        logging.debug(f"Preview processed at {edges.shape[1]}x{edges.shape[0]} with {params}")
+        return trace, params, Image.fromarray(edges)
+
+    def render_full(self, job):
+        # Full-resolution render for export; runs on a worker thread
+        source, params, auto = job
+        params = self.resolve_auto_detail(source, params, auto)
+        with activate(Trace("full", source_size=list(source.size))) as trace:
+            edges = source.render_full(params)
+        trace.finish()
+        logging.info(f"Full-resolution image processed with {params}")
+        return source, params, Image.fromarray(edges)
+
+    def on_render_done(self, result):
+        trace, params, self.preview_image = result
+        if self.auto_detail_var.get():
+            self.detail_var.set(params.detail)  # The slider shows the automatic pick
+        with activate(trace):
+            self.show_image(self.processed_canvas, self.preview_image)
+        record = trace.finish()
+        if self.show_perf:
+            self.draw_perf_overlay(record)
+        logging.debug("Image processing completed and updated on canvas.")
+
+    def draw_perf_overlay(self, record):
+        # Where the milliseconds of the last preview went, slowest stage first
+        stages = sorted(record["stages_ms"].items(), key=lambda item: -item[1])
+        lines = [f"{name:<11}{ms:7.1f} ms" for name, ms in stages]
+        hits = [name for name, outcome in record["cache"].items() if outcome == "hit"]
+        if hits:
+            lines.append(f"cached: {', '.join(hits)}")
+        lines.append(f"{'total':<11}{record['total_ms']:7.1f} ms")
+        canvas = self.processed_canvas
+        canvas.delete("perf")
+        canvas.create_text(8, 8, anchor="nw", text="\n".join(lines), font=("Courier", 9),
+                           fill="#d00000", tags="perf")
+
+    def toggle_perf_overlay(self, event=None):
+        self.show_perf = not self.show_perf
+        if not self.show_perf:
+            self.processed_canvas.delete("perf")
+        elif instrument.recent("preview"):
+            self.draw_perf_overlay(instrument.recent("preview")[-1])
+
+    def on_full_render_done(self, result):
+        source, params, processed_image = result
+        if source is self.source:
+            self.processed_image = processed_image
+            self.processed_params = params
+
+    def export_render(self, source, params, processed):
+        """
+        Full-resolution render for an export worker: the background render
+        snapshot (params, image) when it matches, otherwise a fresh one
+        """
+        processed_params, processed_image = processed
+        if processed_image is not None and processed_params == params:
+            return processed_image
+        # The background full-resolution render is not ready yet
+        return self.render_full((source, params, False))[2]
+
+    def on_render_error(self, e):
+        logging.error(f"Error during image processing: {e}")
+        messagebox.showerror("Error", f"An error occurred during image processing:\n{e}")
+
+    def poll_renders(self):
+        self.scheduler.poll()
+        self.export_scheduler.poll()
+        self.root.after(RENDER_POLL_MS, self.poll_renders)
+
+    def width_changed(self, *args):
+        if self.maintain_aspect_var.get() and self.original_aspect_ratio:
+            try:
+                width = int(self.width_var.get())
+                height = int(round(width / self.original_aspect_ratio))
+                self.height_var.set(height)
+            except ValueError:
+                pass
+
+    def height_changed(self, *args):
+        if self.maintain_aspect_var.get() and self.original_aspect_ratio:
+            try:
+                height = int(self.height_var.get())
+                width = int(round(height * self.original_aspect_ratio))
+                self.width_var.set(width)
+            except ValueError:
+                pass
+
+    def download_image(self):
+        if not self.image:
+            messagebox.showwarning("Warning", "No image to download. Please upload and process an image first.")
+            logging.warning("Download attempted without a processed image.")
+            return
+
+        filename = f"processed_image.{self.format_var.get()}"
+        output_path = filedialog.asksaveasfilename(defaultextension=f".{self.format_var.get()}", initialfile=filename,
+                                                   filetypes=[("All Supported Formats", "*.bmp;*.jpeg;*.jpg;*.png;*.tiff;*.pdf"),
+                                                              ("BMP", "*.bmp"),
+                                                              ("JPEG", "*.jpeg;*.jpg"),
+                                                              ("PNG", "*.png"),
+                                                              ("TIFF", "*.tiff"),
+                                                              ("PDF", "*.pdf")])
+
+        if output_path:
+            try:
+                width = int(self.width_var.get())
+                height = int(self.height_var.get())
+            except ValueError:
+                messagebox.showerror("Error", "Please enter valid integers for width and height.")
+                logging.error("Invalid width or height value entered.")
+                return
+            if use_tiled_export(self.image_size, (width, height), self.quality_var.get(), self.format_var.get()):
+                self.start_tiled_export(output_path, self.format_var.get(), transparent=False)
+                return
+            if exceeds_max_dimension(width, height):
+                messagebox.showerror("Error", f"Maximum supported image dimension is {MAX_DIMENSION} pixels.")
+                logging.error("Resolution exceeds maximum supported image dimension.")
+                return
+
+            # Render, resize and encode off the Tk main thread
+            threading.Thread(target=self.save_image_file,
+                             args=(self.filepath, self.source, self.current_params(), self.auto_detail_var.get(),
+                                   (self.processed_params, self.processed_image), (width, height),
+                                   self.quality_var.get(), self.format_var.get(), self.profile_var.get(), output_path),
+                             daemon=True).start()
+
+    def save_image_file(self, filepath, source, params, auto, processed, dimensions, quality, fmt, profile,
+                        output_path):
+        # Runs on a worker thread; all Tk calls are handed back via root.after
+        try:
+            params = self.resolve_auto_detail(source, params, auto)
+            # Determine final size based on the selected quality
+            size = export_size(*dimensions, quality)
+            cache_key = self.render_cache.key(filepath, params, size, quality, fmt, False, output_path,
+                                              profile=profile)
+            if not self.render_cache.fetch(cache_key, output_path):
+                if renders_at_target(source.size, size):
+                    # Up-scales are rendered at the target size rather than interpolated
+                    img_resized = Image.fromarray(render_at_size(source.gray, params, size))
+                else:
+                    img_resized = resize_for_export(self.export_render(source, params, processed), size)
+                dpi = export_dpi(probe_dpi(filepath), source.size[0], size[0])
+                save_image(img_resized, output_path, fmt, ENCODER_PROFILES[profile], dpi)
+                self.render_cache.store(cache_key, output_path)
+
+            logging.info(f"Image saved: {output_path} with dimensions: {dimensions[0]}x{dimensions[1]}")
+            self.root.after(0, lambda: messagebox.showinfo("Saved", f"Image saved as {output_path}"))
+        except Exception as e:
+            logging.error(f"Error while saving the image: {e}")
+            message = f"An error occurred while saving the image:\n{e}"
+            self.root.after(0, lambda: messagebox.showerror("Error", message))
+
+    def download_image_transparent(self):
+        if not self.image:
+            messagebox.showwarning("Warning", "No image to download. Please upload and process an image first.")
+            logging.warning("Download Transparent attempted without a processed image.")
+            return
+
+        # Prompt user to save the transparent image
+        output_path = filedialog.asksaveasfilename(defaultextension=".png", initialfile="processed_image_transparent.png",
+                                                   filetypes=[("PNG files", "*.png")])
+
+        if output_path:
+            try:
+                width = int(self.width_var.get())
+                height = int(self.height_var.get())
+            except ValueError:
+                messagebox.showerror("Error", "Please enter valid integers for width and height.")
+                logging.error("Invalid width or height value entered.")
+                return
+            if use_tiled_export(self.image_size, (width, height), self.quality_var.get(), "png"):
+                self.start_tiled_export(output_path, "png", transparent=True)
+                return
+            if exceeds_max_dimension(width, height):
+                messagebox.showerror("Error", f"Maximum supported image dimension is {MAX_DIMENSION} pixels.")
+                logging.error("Resolution exceeds maximum supported image dimension.")
+                return
+
+            # Build, resize and encode off the Tk main thread
+            threading.Thread(target=self.save_transparent_image,
+                             args=(self.filepath, self.source, self.current_params(), self.auto_detail_var.get(),
+                                   (self.processed_params, self.processed_image), (width, height),
+                                   self.quality_var.get(), self.profile_var.get(), output_path),
+                             daemon=True).start()
+
+    def save_transparent_image(self, filepath, source, params, auto, processed, dimensions, quality, profile,
+                               output_path):
+        # Runs on a worker thread; all Tk calls are handed back via root.after
+        try:
+            params = self.resolve_auto_detail(source, params, auto)
+            # Determine final size based on the selected quality
+            size = export_size(*dimensions, quality)
+            cache_key = self.render_cache.key(filepath, params, size, quality, "png", True, output_path,
+                                              profile=profile)
+            if not self.render_cache.fetch(cache_key, output_path):
+                if renders_at_target(source.size, size):
+                    # Up-scales are rendered at the target size rather than interpolated
+                    img_resized = make_transparent(Image.fromarray(render_at_size(source.gray, params, size)),
+                                                   params.color_mode)
+                else:
+                    # Make the background transparent
+                    img_rgba = make_transparent(self.export_render(source, params, processed), params.color_mode)
+                    img_resized = resize_for_export(img_rgba, size)
+                save_transparent(img_resized, output_path, ENCODER_PROFILES[profile])
+                self.render_cache.store(cache_key, output_path)
+
+            logging.info(f"Transparent image saved: {output_path} with dimensions: {dimensions[0]}x{dimensions[1]}")
+            self.root.after(0, lambda: messagebox.showinfo("Saved", f"Transparent image saved as {output_path}"))
+        except Exception as e:
+            logging.error(f"Error while saving the transparent image: {e}")
+            message = f"An error occurred while saving the transparent image:\n{e}"
+            self.root.after(0, lambda: messagebox.showerror("Error", message))
+
+    def download_vector(self):
+        if not self.image:
+            messagebox.showwarning("Warning", "No image to download. Please upload and process an image first.")
+            logging.warning("Download Vector attempted without a processed image.")
+            return
+
+        output_path = filedialog.asksaveasfilename(defaultextension=".svg", initialfile="processed_image.svg",
+                                                   filetypes=[("SVG", "*.svg"), ("PDF", "*.pdf")])
+        if output_path:
+            try:
+                width = int(self.width_var.get())
+                height = int(self.height_var.get())
+            except ValueError:
+                messagebox.showerror("Error", "Please enter valid integers for width and height.")
+                logging.error("Invalid width or height value entered.")
+                return
+            threading.Thread(target=self.save_vector_image,
+                             args=(self.filepath, self.source, self.current_params(), self.auto_detail_var.get(),
+                                   (width, height), self.quality_var.get(), output_path),
+                             daemon=True).start()
+
+    def save_vector_image(self, filepath, source, params, auto, dimensions, quality, output_path):
+        # Runs on a worker thread; all Tk calls are handed back via root.after
+        try:
+            params = self.resolve_auto_detail(source, params, auto)
+            size = export_size(*dimensions, quality)
+            fmt = os.path.splitext(output_path)[1].lower().lstrip(".")
+            cache_key = self.render_cache.key(filepath, params, size, quality, fmt, False, output_path, vector=True)
+            if not self.render_cache.fetch(cache_key, output_path):
+                # Reuse the full-resolution Canny edges unless the image is big
+                # enough to be edge-detected in strips
+                width, height = source.size
+                edges = source.edges_full(params) if width * height < TILED_EXPORT_PIXELS else None
+                export_vector(source.gray, params, output_path, size, export_dpi(probe_dpi(filepath), width, size[0]),
+                              edges=edges)
+                self.render_cache.store(cache_key, output_path)
+            logging.info(f"Vector image saved: {output_path} with dimensions: {size[0]}x{size[1]}")
+            self.root.after(0, lambda: messagebox.showinfo("Saved", f"Vector image saved as {output_path}"))
+        except Exception as e:
+            logging.error(f"Error while saving the vector image: {e}")
+            message = f"An error occurred while saving the vector image:\n{e}"
+            self.root.after(0, lambda: messagebox.showerror("Error", message))
+
+    def start_tiled_export(self, output_path, fmt, transparent):
+        # Very large native-size exports are rendered in strips and streamed to disk
+        threading.Thread(target=self.save_tiled_image,
+                         args=(self.filepath, self.source, self.current_params(), self.auto_detail_var.get(),
+                               self.quality_var.get(), self.profile_var.get(), output_path, fmt, transparent),
+                         daemon=True).start()
+
+    def save_tiled_image(self, filepath, source, params, auto, quality, profile, output_path, fmt, transparent):
+        # Runs on a worker thread; all Tk calls are handed back via root.after
+        label = "Transparent image" if transparent else "Image"
+        try:
+            params = self.resolve_auto_detail(source, params, auto)
+            cache_key = self.render_cache.key(filepath, params, source.size, quality, fmt, transparent, output_path,
+                                              profile=profile)
+            if not self.render_cache.fetch(cache_key, output_path):
+                export_tiled(source.gray, params, output_path, fmt, transparent=transparent,
+                             workers=os.cpu_count() or 1, profile=ENCODER_PROFILES[profile])
+                self.render_cache.store(cache_key, output_path)
+            logging.info(f"{label} saved: {output_path} (tiled)")
+            self.root.after(0, lambda: messagebox.showinfo("Saved", f"{label} saved as {output_path}"))
+        except Exception as e:
+            logging.error(f"Error while saving the image: {e}")
+            message = f"An error occurred while saving the image:\n{e}"
+            self.root.after(0, lambda: messagebox.showerror("Error", message))
+
+    def convert_animation_file(self):
+        source_path = filedialog.askopenfilename(
+            filetypes=[("Animations and videos", "*.gif *.webp *.mp4 *.mov *.m4v *.avi *.mkv")])
+        if not source_path:
+            return
+        output_path = filedialog.asksaveasfilename(
+            defaultextension=".gif", filetypes=[(ext[1:].upper(), "*" + ext) for ext in ANIMATION_OUTPUTS])
+        if not output_path:
+            return
+        # With auto detail on, the clip gets a detail level of its own
+        threading.Thread(target=self.save_animation,
+                         args=(source_path, output_path, self.current_params(), self.auto_detail_var.get()),
+                         daemon=True).start()
+
+    def save_animation(self, source_path, output_path, params, auto_detail=False):
+        # Runs on a worker thread; all Tk calls are handed back via root.after
+        try:
+            summary = convert_animation(source_path, output_path, params, auto_detail=auto_detail)
+            message = (f"Converted {summary['frames']} frames ({summary['fps']:.1f} frames/s)\n"
+                       f"Saved as {output_path}")
+            self.root.after(0, lambda: messagebox.showinfo("Saved", message))
+        except Exception as e:
+            logging.error(f"Error while converting the animation: {e}")
+            message = f"An error occurred while converting the animation:\n{e}"
+            self.root.after(0, lambda: messagebox.showerror("Error", message))
+
+    def resize_canvases(self, event):
+        # <Configure> fires for every widget and many times per second while
+        # dragging; redraw once the window has settled
+        if self.resize_job is not None:
+            self.root.after_cancel(self.resize_job)
+        self.resize_job = self.root.after(RESIZE_DEBOUNCE_MS, self.redraw_canvases)
+
+    def redraw_canvases(self):
+        # Each view redraws only if its canvas size actually changed
+        self.resize_job = None
+        self.original_canvas.view.refresh()
+        self.processed_canvas.view.refresh()
+        # The proxy was sized for the old canvas; render a new one to match
+        if self.preview_image and self.canvas_size(self.processed_canvas) != self.preview_size:
+            self.request_preview(self.current_params())
+
+    def reset_settings(self):
+        # Reset all settings to default values
+        self.detail_var.set(1.0)
+        self.auto_detail_var.set(False)
+        self.detail_scale.state(["!disabled"])
+        self.thickness_var.set(1)
+        self.brightness_var.set(1.0)
+        self.style_var.set("smooth")
+        self.color_mode_var.set("black_on_white")
+        self.format_var.set("png")
+        self.quality_var.set("Best")
+        self.profile_var.set("default")
+        self.maintain_aspect_var.set(True)
+        if self.image:
+            self.width_var.set(self.image_size[0])
+            self.height_var.set(self.image_size[1])
+        self.update_image()
+        logging.info("Settings reset to default.")
+
+class CreateToolTip(object):
+    """
+    Create a tooltip for a given widget
+    """
+    def __init__(self, widget, text='widget info'):
+        self.waittime = 500     # milliseconds
+        self.wraplength = 180   # pixels
+        self.widget = widget
+        self.text = text
+        self.widget.bind('<Enter>', self.enter)
+        self.widget.bind('<Leave>', self.leave)
+        self.id = None
+        self.tw = None
+
+    def enter(self, event=None):
+        self.schedule()
+
+    def leave(self, event=None):
+        self.unschedule()
+        self.hidetip()
+
+    def schedule(self):
+        self.unschedule()
+        self.id = self.widget.after(self.waittime, self.showtip)
+
+    def unschedule(self):
+        _id = self.id
+        self.id = None
+        if _id:
+            self.widget.after_cancel(_id)
+
+    def showtip(self, event=None):
+        x = y = 0
+        x += self.widget.winfo_rootx() + 20
+        y += self.widget.winfo_rooty() + 20
+        # creates a toplevel window
+        self.tw = tk.Toplevel(self.widget)
+        self.tw.wm_overrideredirect(True)    # removes the window decorations
+        self.tw.wm_geometry(f"+{x}+{y}")
+        label = tk.Label(self.tw, text=self.text, justify='left',
+                         background='#ffffe0', relief='solid', borderwidth=1,
+                         wraplength=self.wraplength)
+        label.pack(ipadx=1)
+
+    def hidetip(self):
+        tw = self.tw
+        self.tw = None
+        if tw:
+            tw.destroy()
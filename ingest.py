@@ -0,0 +1,193 @@
+"""
+Image ingest: decode straight to 8-bit grayscale.
+
+The pipeline only ever works on grayscale, so decoding to RGB, copying that
+into NumPy and converting again holds three full-size buffers for nothing.
+load_gray() avoids the RGB copy:
+
+* .npy files and uncompressed TIFF/BMP are memory-mapped; 8-bit grayscale
+  data is used in place without being read into memory up front
+* grayscale files are decoded directly to one channel
+* color files are decoded once and converted with the same weights as before,
+  so full-resolution output is unchanged
+
+load_gray_reduced() is for previews: it lets the decoder downscale on open
+(JPEG DCT scaling via cv2.IMREAD_REDUCED_GRAYSCALE_*), which is much faster on
+large photos and never materializes the full image.
+"""
+import io
+import logging
+import os
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Keep pixel data in file order; the GUI never applied EXIF rotation either
+_IGNORE_ORIENTATION = cv2.IMREAD_IGNORE_ORIENTATION
+
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+                  (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                  (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+
+# Raw PIL layouts that can be memory-mapped: rawmode -> (channels, cvtColor code)
+_RAW_LAYOUTS = {"L": (1, None), "RGB": (3, cv2.COLOR_RGB2GRAY), "BGR": (3, cv2.COLOR_BGR2GRAY)}
+
+
+def probe_size(path):
+    """
+    Return (width, height) without decoding pixel data
+    """
+    if path.lower().endswith(".npy"):
+        shape = np.load(path, mmap_mode="r").shape
+        return shape[1], shape[0]
+    with Image.open(path) as im:
+        return im.size
+
+
+def probe_dpi(source):
+    """
+    Horizontal DPI recorded in an image file (path or file object), or None
+    """
+    if isinstance(source, str) and source.lower().endswith(".npy"):
+        return None
+    try:
+        with Image.open(source) as im:
+            dpi = im.info.get("dpi")
+    except OSError:
+        return None
+    return float(dpi[0]) if dpi and dpi[0] else None
+
+
+def _gray_from_array(arr):
+    if arr.dtype != np.uint8:
+        raise ValueError(f"Expected 8-bit image data, got {arr.dtype}")
+    if arr.ndim == 2:
+        return arr
+    if arr.ndim == 3 and arr.shape[2] == 1:
+        return arr[:, :, 0]
+    if arr.ndim == 3 and arr.shape[2] in (3, 4):
+        return cv2.cvtColor(np.ascontiguousarray(arr[:, :, :3]), cv2.COLOR_RGB2GRAY)
+    raise ValueError(f"Unsupported array shape: {arr.shape}")
+
+
+def _memmap_raw(path, im):
+    """
+    Memory-map an uncompressed TIFF/BMP described by PIL's tile list, or None
+    """
+    if len(im.tile) != 1:
+        return None
+    tile = im.tile[0]
+    if tile.codec_name != "raw" or tuple(tile.extents) != (0, 0) + im.size:
+        return None
+    rawmode, stride, orientation = (tuple(tile.args) + (0, 1))[:3]
+    if rawmode not in _RAW_LAYOUTS:
+        return None
+    channels, code = _RAW_LAYOUTS[rawmode]
+    width, height = im.size
+    stride = stride or width * channels
+    if os.path.getsize(path) < tile.offset + stride * height:
+        return None
+
+    rows = np.memmap(path, np.uint8, mode="r", offset=tile.offset, shape=(height, stride))
+    pixels = rows[:, :width * channels].reshape(height, width, channels) if channels > 1 else rows[:, :width]
+    if orientation == -1:
+        # Bottom-up bitmap; OpenCV needs positive strides
+        pixels = np.ascontiguousarray(pixels[::-1])
+    if code is None:
+        return pixels
+    return cv2.cvtColor(np.ascontiguousarray(pixels), code)
+
+
+def load_gray(path):
+    """
+    Return the full-resolution image at `path` as a 2-D uint8 array
+    """
+    if path.lower().endswith(".npy"):
+        return _gray_from_array(np.load(path, mmap_mode="r"))
+
+    with Image.open(path) as im:
+        mode = im.mode
+        if im.format in ("TIFF", "BMP"):
+            gray = _memmap_raw(path, im)
+            if gray is not None:
+                logging.info(f"Memory-mapped {path}")
+                return gray
+
+    gray = _gray_via_opencv(mode, lambda flags: cv2.imread(path, flags))
+    if gray is not None:
+        return gray
+
+    # Palette, 16-bit and formats OpenCV cannot read go through Pillow
+    with Image.open(path) as im:
+        return cv2.cvtColor(np.asarray(im.convert("RGB")), cv2.COLOR_RGB2GRAY)
+
+
+def decode_gray(data):
+    """
+    Like load_gray(), for an encoded image held in memory (e.g. an upload)
+    """
+    with Image.open(io.BytesIO(data)) as im:
+        mode = im.mode
+    buf = np.frombuffer(data, np.uint8)
+    gray = _gray_via_opencv(mode, lambda flags: cv2.imdecode(buf, flags))
+    if gray is not None:
+        return gray
+
+    with Image.open(io.BytesIO(data)) as im:
+        return cv2.cvtColor(np.asarray(im.convert("RGB")), cv2.COLOR_RGB2GRAY)
+
+
+def _gray_via_opencv(mode, decode):
+    """
+    Decode with OpenCV when that matches the Pillow RGB path; None otherwise
+    """
+    if mode == "L":
+        return decode(cv2.IMREAD_GRAYSCALE | _IGNORE_ORIENTATION)
+    if mode in ("RGB", "RGBA"):
+        # Decode once to BGR and convert; same weights as the RGB path
+        bgr = decode(cv2.IMREAD_COLOR | _IGNORE_ORIENTATION)
+        if bgr is not None:
+            return cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    return None
+
+
+def load_gray_reduced(path, max_width, max_height):
+    """
+    Decode a grayscale image at least max_width x max_height, letting the
+    decoder skip as much resolution as possible. Returns a 2-D uint8 array.
+    """
+    if path.lower().endswith(".npy"):
+        return load_gray(path)
+    width, height = probe_size(path)
+    # Largest decoder reduction that still covers the requested box
+    for factor, flag in _REDUCED_FLAGS:
+        if width / factor >= max_width and height / factor >= max_height:
+            gray = cv2.imread(path, flag | _IGNORE_ORIENTATION)
+            if gray is not None:
+                return gray
+            break
+
+    # Pillow fallback: JPEG draft mode still decodes at reduced scale
+    with Image.open(path) as im:
+        im.draft("L", (max_width, max_height))
+        if im.mode != "L":
+            im = im.convert("RGB")
+            return cv2.cvtColor(np.asarray(im), cv2.COLOR_RGB2GRAY)
+        return np.asarray(im)
+
+
+def load_display_image(path, max_size):
+    """
+    Return a small RGB PIL image for showing the original on screen
+    """
+    if path.lower().endswith(".npy"):
+        img = Image.fromarray(np.asarray(load_gray(path))).convert("RGB")
+        img.thumbnail(max_size, Image.LANCZOS)
+        return img
+    with Image.open(path) as im:
+        im.draft("RGB", max_size)
+        if im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        im.thumbnail(max_size, Image.LANCZOS)
+        return im.convert("RGB")
@@ -0,0 +1,294 @@
+"""
+Lightweight instrumentation for the render hot path.
+
+A Trace collects per-stage durations, image sizes and cache outcomes for one
+unit of work (a preview, a full render). The trace is bound to the current
+thread with activate(); code on the hot path wraps each stage in
+`with stage("canny"):`, which costs one attribute lookup when no trace is
+active. Finished traces are kept in a small ring for the summary/overlay and
+emitted as JSON lines on the "artliner.perf" logger.
+
+Logging goes through a QueueHandler, so the render and Tk threads only enqueue
+records; a QueueListener thread does the file and console I/O.
+
+Profiling is opt-in: start_profiler("cprofile", path) profiles every thread
+that runs a wrapped function, start_profiler("sample", path) samples all
+thread stacks and writes collapsed stacks (flame graph input).
+"""
+import atexit
+import cProfile
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+PERF_LOGGER = "artliner.perf"
+
+# Finished traces kept in memory for summary() and the GUI overlay
+RECENT_TRACES = 256
+
+SAMPLE_INTERVAL = 0.005
+
+_local = threading.local()
+_recent = deque(maxlen=RECENT_TRACES)
+
+perf_log = logging.getLogger(PERF_LOGGER)
+# Perf records only go where configure_perf_log() sends them
+perf_log.propagate = False
+perf_log.setLevel(logging.INFO)
+
+
+class Trace:
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+        self.stages = {}  # stage -> milliseconds
+        self.cache = {}   # stage -> "hit" or "miss"
+        self.start = time.perf_counter()
+        self.record = None
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds * 1000
+
+    def finish(self):
+        """
+        Close the trace and emit it; returns the record
+        """
+        if self.record is None:
+            self.record = {
+                "trace": self.name,
+                "time": time.time(),
+                "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+                "stages_ms": {stage: round(ms, 3) for stage, ms in self.stages.items()},
+                "cache": self.cache,
+                **self.fields,
+            }
+            _recent.append(self.record)
+            if perf_log.handlers:
+                perf_log.info(self.name, extra={"perf": self.record})
+        return self.record
+
+
+def current():
+    return getattr(_local, "trace", None)
+
+
+class activate:
+    """
+    Bind a trace to the current thread for the duration of a with block
+    """
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __enter__(self):
+        self.previous = current()
+        _local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, *exc):
+        _local.trace = self.previous
+
+
+class _StageTimer:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.start)
+
+
+class _NoTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_TIMER = _NoTimer()
+
+
+def stage(name):
+    """
+    Time a stage into the active trace (a no-op without one)
+    """
+    trace = current()
+    if trace is None:
+        return _NO_TIMER
+    return _StageTimer(trace, name)
+
+
+def record_cache(stage_name, hit):
+    trace = current()
+    if trace is not None:
+        trace.cache[stage_name] = "hit" if hit else "miss"
+
+
+def recent(name=None):
+    return [r for r in list(_recent) if name is None or r["trace"] == name]
+
+
+def summary(name=None):
+    """
+    Mean and p95 milliseconds per stage over the recent traces
+    """
+    import numpy as np
+
+    records = recent(name)
+    by_stage = {}
+    for record in records:
+        for stage_name, ms in record["stages_ms"].items():
+            by_stage.setdefault(stage_name, []).append(ms)
+        by_stage.setdefault("total", []).append(record["total_ms"])
+    return {stage_name: {"count": len(values), "mean_ms": float(np.mean(values)),
+                         "p95_ms": float(np.percentile(values, 95))}
+            for stage_name, values in by_stage.items()}
+
+
+def format_summary(name=None):
+    lines = [f"{'stage':12s} {'count':>6s} {'mean ms':>9s} {'p95 ms':>9s}"]
+    for stage_name, s in sorted(summary(name).items(), key=lambda item: -item[1]["mean_ms"]):
+        lines.append(f"{stage_name:12s} {s['count']:6d} {s['mean_ms']:9.2f} {s['p95_ms']:9.2f}")
+    return "\n".join(lines)
+
+
+class JSONLinesFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(getattr(record, "perf", {"message": record.getMessage()}))
+
+
+def queue_logging(logger, *handlers):
+    """
+    Route logger through a QueueHandler to handlers served by a listener
+    thread; returns the started QueueListener (stopped at exit)
+    """
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    logger.addHandler(queue_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    def log_directly():
+        # A forked pool worker has no listener thread and may exit without
+        # running atexit, so it writes to the handlers itself
+        logger.removeHandler(queue_handler)
+        for handler in handlers:
+            logger.addHandler(handler)
+
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=log_directly)
+    return listener
+
+
+def configure_perf_log(path):
+    """
+    Write every finished trace to path as one JSON object per line
+    """
+    handler = logging.FileHandler(path)
+    handler.setFormatter(JSONLinesFormatter())
+    return queue_logging(perf_log, handler)
+
+
+class _CProfiler:
+    """
+    One cProfile.Profile per thread that runs a wrapped function, merged on stop
+    """
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def wrap(self, fn):
+        def profiled(*args, **kwargs):
+            profile = getattr(self._local, "profile", None)
+            if profile is None:
+                profile = self._local.profile = cProfile.Profile()
+                with self._lock:
+                    self._profiles.append(profile)
+            profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+        return profiled
+
+    def stop(self):
+        with self._lock:
+            profiles = [p for p in self._profiles if p.getstats()]
+        if not profiles:
+            return
+        import pstats
+
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(self.path)
+        logging.info(f"cProfile stats written to {self.path}")
+
+
+class _Sampler:
+    """
+    Samples the stacks of all other threads and writes collapsed stacks
+    """
+    def __init__(self, path, interval=SAMPLE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def wrap(self, fn):
+        return fn
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        with open(self.path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        logging.info(f"{sum(self.samples.values())} stack samples written to {self.path}")
+
+
+PROFILERS = {"cprofile": _CProfiler, "sample": _Sampler}
+DEFAULT_PROFILE_PATHS = {"cprofile": "artliner.prof", "sample": "artliner_stacks.txt"}
+
+
+def start_profiler(kind, path=None):
+    """
+    Start an opt-in profiler; call .wrap(fn) on the functions to cover and
+    .stop() to write the results
+    """
+    return PROFILERS[kind](path or DEFAULT_PROFILE_PATHS[kind])
@@ -0,0 +1,96 @@
+"""
+Preview sources for the GUI.
+
+A PreviewSource wraps one uploaded image and lazily provides its
+full-resolution grayscale array plus proxies sized to the preview canvas.
+Previews render on the proxy; the full-resolution array is only rendered for
+export. Every stage (grayscale, proxies, brightness, Canny, dilation, style)
+lives in a per-image StageCache, so a settings change only recomputes the
+stages after the parameter that moved. The gradient statistics behind auto
+detail are cached there too, once per brightness.
+"""
+import cv2
+import numpy as np
+
+from cache import StageCache
+from engine import (AUTO_DETAIL_BRIGHTNESS_DIGITS, auto_detail, edges_cached, gradient_histogram, render_cached,
+                    to_gray)
+from ingest import load_gray, load_gray_reduced, probe_size
+
+
+class PreviewSource:
+    def __init__(self, load_full, size, load_reduced=None, cache=None):
+        self._load_full = load_full
+        self._load_reduced = load_reduced
+        self.size = size  # (width, height) of the full-resolution image
+        self.cache = cache if cache is not None else StageCache()
+
+    @classmethod
+    def from_image(cls, image, cache=None):
+        """
+        Source backed by an in-memory PIL image
+        """
+        return cls(lambda: to_gray(np.array(image)), image.size, cache=cache)
+
+    @classmethod
+    def from_path(cls, path, cache=None):
+        """
+        Source backed by a file; previews can be decoded at reduced size
+        without ever loading the full image
+        """
+        return cls(lambda: load_gray(path), probe_size(path),
+                   load_reduced=lambda w, h: load_gray_reduced(path, w, h), cache=cache)
+
+    @property
+    def gray(self):
+        return self.cache.get_or_compute("gray", (), self._load_full)
+
+    def proxy(self, max_width, max_height):
+        """
+        Return (proxy, scale) fitting max_width x max_height
+        """
+        width, height = self.size
+        scale = min(max_width / width, max_height / height)
+        if scale >= 1.0:
+            return self.gray, 1.0
+        proxy_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+
+        def build():
+            # Downscale the full image if it is already loaded, otherwise let
+            # the decoder produce a reduced image first
+            gray = self.cache.get("gray", ())
+            if gray is None and self._load_reduced is not None:
+                gray = self._load_reduced(*proxy_size)
+            if gray is None:
+                gray = self.gray
+            return cv2.resize(gray, proxy_size, interpolation=cv2.INTER_AREA)
+
+        proxy = self.cache.get_or_compute("proxy", (max_width, max_height), build)
+        return proxy, scale
+
+    def auto_detail(self, brightness, compute=True):
+        """
+        Detail picked from the full-resolution image's gradient statistics.
+        Without compute, returns None unless they are cached already.
+        Brightnesses that gradient_histogram rounds alike share one entry, so
+        dragging the brightness slider reuses them.
+        """
+        key = ("full", round(brightness, AUTO_DETAIL_BRIGHTNESS_DIGITS))
+        if compute:
+            histogram = self.cache.get_or_compute("gradients", key, lambda: gradient_histogram(self.gray, brightness))
+        else:
+            histogram = self.cache.get("gradients", key)
+        return None if histogram is None else auto_detail(histogram)
+
+    def render_preview(self, params, max_width, max_height):
+        proxy, scale = self.proxy(max_width, max_height)
+        return render_cached(proxy, params, self.cache, key=("proxy", max_width, max_height), scale=scale)
+
+    def render_full(self, params):
+        return render_cached(self.gray, params, self.cache, key=("full",))
+
+    def edges_full(self, params):
+        """
+        Full-resolution Canny edges, shared with render_full's cache entries
+        """
+        return edges_cached(self.gray, params, self.cache, key=("full",))[0]
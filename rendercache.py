@@ -0,0 +1,214 @@
+"""
+Persistent, content-addressed cache of exported files.
+
+Re-exporting the same photo with the same settings is common, and every export
+redoes the whole pipeline plus the LANCZOS resize. RenderCache stores finished
+exports on disk keyed by a hash of the source file's bytes and the canonical
+export settings, so a repeat export becomes a file copy.
+
+The cache directory can be shared by several processes (GUI, batch workers,
+the render service):
+
+* entries are written to a temporary file and moved into place with
+  os.replace, so readers never see a partial file
+* a hit copies the entry and bumps its mtime, which is the LRU clock
+* eviction deletes the least recently used entries once the directory grows
+  past max_bytes; files that vanish or are locked mid-operation are skipped
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import export
+
+# Bump when the pipeline or encoders change output for the same settings
+CACHE_VERSION = 2
+
+DEFAULT_DISK_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+
+# Re-scan the directory for eviction after writing this fraction of max_bytes
+EVICT_CHECK_FRACTION = 0.05
+
+# Temporary files older than this were left behind by a crashed writer
+STALE_TEMP_SECONDS = 3600
+
+_TEMP_PREFIX = ".tmp-"
+_HASH_CHUNK = 1024 * 1024
+
+
+def default_cache_dir():
+    """
+    ARTLINER_CACHE_DIR, or the per-user cache directory for this platform
+    """
+    if os.environ.get("ARTLINER_CACHE_DIR"):
+        return os.environ["ARTLINER_CACHE_DIR"]
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "ArtLiner", "Cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "artliner")
+
+
+class RenderCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_DISK_CACHE_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._digests = {}  # (path, size, mtime) -> sha256 of the file
+        self._written = None  # Bytes stored since the last eviction scan
+        self._lock = threading.Lock()
+
+    def source_digest(self, path):
+        """
+        SHA-256 of a source file, remembered until the file changes
+        """
+        st = os.stat(path)
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                    h.update(chunk)
+            digest = h.hexdigest()
+            self._digests[memo_key] = digest
+        return digest
+
+    def key(self, source_path, params, size, quality, fmt, transparent, output_path="", fast_resize=None,
+            profile="default", auto_detail=False, vector=False):
+        """
+        Cache key for exporting source_path with these settings.
+
+        output_path only contributes its extension, which decides the encoder
+        for non-PDF exports. fast_resize defaults to export.FAST_RESIZE;
+        profile is the name of the export.EncoderProfile. With auto_detail,
+        params.detail is ignored: the detail is a function of the source, so
+        the key does not need the image to be decoded. vector marks a traced
+        SVG/PDF export (see vector.py).
+        """
+        ext = os.path.splitext(output_path)[1].lower()
+        if fast_resize is None:
+            fast_resize = export.FAST_RESIZE
+        canonical = [CACHE_VERSION, self.source_digest(source_path),
+                     "auto" if auto_detail else float(params.detail), int(params.thickness), float(params.brightness),
+                     params.style, params.color_mode, [int(size[0]), int(size[1])],
+                     quality, fmt, bool(transparent), ext, bool(fast_resize), profile]
+        if vector:
+            canonical.append("vector")
+        return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def fetch(self, key, output_path):
+        """
+        Copy a cached export to output_path; returns False on a miss
+        """
+        if not self.max_bytes:
+            return False
+        entry = self._entry_path(key)
+        try:
+            shutil.copyfile(entry, output_path)
+            os.utime(entry)
+        except OSError:
+            # Missing, or evicted by another process while we looked
+            self.misses += 1
+            return False
+        self.hits += 1
+        logging.info(f"Render cache hit: {output_path}")
+        return True
+
+    def store(self, key, output_path):
+        """
+        Add a finished export to the cache (best effort, never raises)
+        """
+        if not self.max_bytes:
+            return
+        entry = self._entry_path(key)
+        try:
+            size = os.path.getsize(output_path)
+            if size > self.max_bytes:
+                return
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=os.path.dirname(entry))
+            try:
+                with os.fdopen(fd, "wb") as dst, open(output_path, "rb") as src:
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp_path, entry)
+            except OSError:
+                # Another process may hold the same entry open (Windows); its
+                # content is identical, so dropping ours is fine
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+        except OSError as e:
+            logging.warning(f"Could not store render cache entry: {e}")
+            return
+
+        with self._lock:
+            check = self._written is None or self._written + size > self.max_bytes * EVICT_CHECK_FRACTION
+            self._written = 0 if check else self._written + size
+        if check:
+            self.evict()
+
+    def _entries(self):
+        """
+        Yield (path, size, mtime) for every entry; removes stale temp files
+        """
+        now = time.time()
+        try:
+            shards = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                files = list(os.scandir(shard.path))
+            except FileNotFoundError:
+                continue
+            for entry in files:
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.startswith(_TEMP_PREFIX):
+                    if now - st.st_mtime > STALE_TEMP_SECONDS:
+                        self._remove(entry.path)
+                    continue
+                yield entry.path, st.st_size, st.st_mtime
+
+    def evict(self):
+        """
+        Delete least recently used entries until the cache fits max_bytes
+        """
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                total -= size
+        return total
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            # Already gone, or open in another process on Windows
+            return False
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        with self._lock:
+            self._written = None
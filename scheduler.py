@@ -0,0 +1,117 @@
+"""
+Render scheduler for interactive previews.
+
+A single worker thread renders the most recently submitted job. Bursts of
+submissions (e.g. dragging a slider) are coalesced: once a job arrives the
+worker waits a short debounce interval and then renders only the latest one.
+Each submission gets a generation number so results that have been superseded
+or cancelled are dropped instead of overwriting newer output.
+
+Results are not delivered from the worker thread. The owner calls poll() from
+its own thread (the Tk main loop via root.after) to receive them.
+"""
+import logging
+import queue
+import threading
+import time
+
+
+class RenderScheduler:
+    def __init__(self, render_fn, on_result, on_error=None, debounce=0.03):
+        self.render_fn = render_fn
+        self.on_result = on_result
+        self.on_error = on_error
+        self.debounce = debounce
+
+        self._cond = threading.Condition()
+        self._pending = None        # (generation, job) waiting to be rendered
+        self._generation = 0        # last generation handed out by submit()
+        self._floor = 0             # results older than this were cancelled
+        self._delivered = 0         # last generation passed to on_result
+        self._closed = False
+        self._results = queue.Queue()
+
+        self.stats = {"submitted": 0, "rendered": 0, "coalesced": 0, "dropped": 0}
+
+        self._thread = threading.Thread(target=self._run, name="render-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, job):
+        """
+        Queue job for rendering, replacing any job that has not started yet
+        """
+        with self._cond:
+            self._generation += 1
+            if self._pending is not None:
+                self.stats["coalesced"] += 1
+            self._pending = (self._generation, job)
+            self.stats["submitted"] += 1
+            self._cond.notify()
+            return self._generation
+
+    def cancel(self):
+        """
+        Drop the pending job and any result from work already in flight
+        """
+        with self._cond:
+            self._pending = None
+            self._floor = self._generation + 1
+
+    def poll(self):
+        """
+        Deliver finished results on the calling thread; returns how many were shown
+        """
+        delivered = 0
+        while True:
+            try:
+                generation, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                return delivered
+            # Drop results that are cancelled or older than what is on screen
+            if generation < self._floor or generation <= self._delivered:
+                self.stats["dropped"] += 1
+                continue
+            self._delivered = generation
+            if ok:
+                self.on_result(value)
+                delivered += 1
+            elif self.on_error:
+                self.on_error(value)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = None
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # Let a burst of changes settle, then take only the latest one
+                deadline = time.monotonic() + self.debounce
+                while not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._closed:
+                    return
+                if self._pending is None:
+                    continue
+                generation, job = self._pending
+                self._pending = None
+
+            if generation < self._floor:
+                self.stats["dropped"] += 1
+                continue
+            try:
+                result = (generation, True, self.render_fn(job))
+                self.stats["rendered"] += 1
+            except Exception as e:
+                logging.error(f"Error during image processing: {e}")
+                result = (generation, False, e)
+            self._results.put(result)
@@ -0,0 +1,486 @@
+"""
+Local HTTP render service.
+
+Usage:
+    python main.py serve [--host 127.0.0.1] [--port 8765] [--workers N]
+        [--queue-size 64] [--batch-size 4] [--timeout 30] [--max-body-mb 64]
+
+Endpoints:
+    POST /render   Body is the encoded image. Query parameters: detail,
+                   thickness, brightness, style, color_mode, format, quality,
+                   transparent, width, height, profile, timeout. Returns the
+                   image bytes. detail=auto picks the detail from the image.
+    GET  /metrics  Queue depth, latency histograms and worker utilization
+                   (Prometheus text format)
+    GET  /health
+
+Requests wait in a bounded queue (a full queue answers 503 with Retry-After)
+and are rendered in a process pool. When every worker is busy, queued requests
+are coalesced into small batches so one task carries several images, and
+identical requests in a batch are rendered once. Responses are byte-identical
+to what "Download Image" / "Download Transparent" save with the same settings.
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import Image, UnidentifiedImageError
+
+from engine import AUTO_DETAIL, RenderParams, auto_params, parse_detail, render, render_at_size
+from export import (ENCODER_PROFILES, FORMATS, QUALITY_OPTIONS, encode_image, encode_transparent,
+                    exceeds_max_dimension, export_dpi, export_size, make_transparent, renders_at_target, resize_for_export)
+from ingest import decode_gray, probe_dpi
+
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_BATCH_SIZE = 4
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_BODY = 64 * 1024 * 1024
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16)
+
+CONTENT_TYPES = {
+    'bmp': "image/bmp",
+    'jpeg': "image/jpeg",
+    'jpg': "image/jpeg",
+    'png': "image/png",
+    'tiff': "image/tiff",
+    'pdf': "application/pdf",
+}
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class Overloaded(Exception):
+    """
+    Raised when the request queue is full
+    """
+
+
+@dataclass(frozen=True)
+class RenderRequest:
+    """
+    One /render call as handed to a worker process (hashable, picklable)
+    """
+    data: bytes
+    params: RenderParams
+    fmt: str = "png"
+    quality: str = "Best"
+    transparent: bool = False
+    width: Optional[int] = None   # Requested output size; the source size when None
+    height: Optional[int] = None
+    profile: str = "default"      # Name of an export.EncoderProfile
+    auto_detail: bool = False     # Replace params.detail with engine.auto_detail for the image
+
+    @property
+    def content_type(self):
+        return CONTENT_TYPES['png'] if self.transparent else CONTENT_TYPES[self.fmt]
+
+
+def request_from_query(query, data):
+    """
+    Build a RenderRequest from /render query parameters; raises ValueError
+    """
+    args = {name: values[-1] for name, values in parse_qs(query).items()}
+    if not data:
+        raise ValueError("Request body must contain an image")
+    detail = parse_detail(args.get("detail", 1.0))
+    auto_detail = detail == AUTO_DETAIL
+    params = RenderParams(detail=1.0 if auto_detail else detail,
+                          thickness=int(float(args.get("thickness", 1))),
+                          brightness=float(args.get("brightness", 1.0)),
+                          style=args.get("style", "smooth"),
+                          color_mode=args.get("color_mode", "black_on_white"))
+    fmt = args.get("format", "png").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    quality = args.get("quality", "Best")
+    if quality not in QUALITY_OPTIONS:
+        raise ValueError(f"Unknown quality: {quality}")
+    width = int(args["width"]) if "width" in args else None
+    height = int(args["height"]) if "height" in args else None
+    if (width is not None and width <= 0) or (height is not None and height <= 0):
+        raise ValueError("width and height must be positive")
+    profile = args.get("profile", "default")
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile: {profile}")
+    return RenderRequest(data, params, fmt, quality, args.get("transparent", "").lower() in ("1", "true", "yes"),
+                         width, height, profile, auto_detail)
+
+
+def render_request(request):
+    """
+    Run one request through the same steps as the GUI downloads
+    """
+    gray = decode_gray(request.data)
+    params = auto_params(gray, request.params) if request.auto_detail else request.params
+    width = request.width or gray.shape[1]
+    height = request.height or gray.shape[0]
+    if exceeds_max_dimension(width, height):
+        raise ValueError("Resolution exceeds maximum supported image dimension.")
+
+    size = export_size(width, height, request.quality)
+    profile = ENCODER_PROFILES[request.profile]
+    dpi = export_dpi(probe_dpi(io.BytesIO(request.data)), gray.shape[1], size[0])
+    if renders_at_target((gray.shape[1], gray.shape[0]), size):
+        img = Image.fromarray(render_at_size(gray, params, size))
+        if request.transparent:
+            return encode_transparent(make_transparent(img, params.color_mode), profile)
+        return encode_image(img, request.fmt, profile, dpi)
+
+    processed = Image.fromarray(render(gray, params))
+    if request.transparent:
+        img_rgba = make_transparent(processed, params.color_mode)
+        return encode_transparent(resize_for_export(img_rgba, size), profile)
+    return encode_image(resize_for_export(processed, size), request.fmt, profile, dpi)
+
+
+def render_batch(requests):
+    """
+    Render a coalesced batch inside a pool worker.
+
+    Returns ([(status, payload)] in request order, busy seconds).
+    """
+    start = time.perf_counter()
+    results = []
+    for request in requests:
+        try:
+            results.append((200, render_request(request)))
+        except (ValueError, UnidentifiedImageError) as e:
+            results.append((400, str(e)))
+        except Exception as e:
+            logging.error(f"Render failed: {e}")
+            results.append((500, str(e)))
+    return results, time.perf_counter() - start
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus style
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{le="{bound:g}"}} {cumulative}'
+        yield f'{name}_bucket{{le="+Inf"}} {self.count}'
+        yield f"{name}_sum {self.sum:.6f}"
+        yield f"{name}_count {self.count}"
+
+
+class Metrics:
+    def __init__(self, workers):
+        self.workers = workers
+        self.started = time.monotonic()
+        self.responses = {}  # HTTP status -> count
+        self.coalesced = 0   # Requests answered by an identical request's render
+        self.busy_seconds = 0.0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queue_wait = Histogram(LATENCY_BUCKETS)
+        self.render_time = Histogram(LATENCY_BUCKETS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+
+    def utilization(self):
+        """
+        Fraction of worker time spent rendering since start-up
+        """
+        elapsed = time.monotonic() - self.started
+        return self.busy_seconds / (self.workers * elapsed) if elapsed > 0 else 0.0
+
+    def exposition(self, queue_depth, inflight):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        metric("artliner_queue_depth", "gauge", "Requests waiting for a worker",
+               [f"artliner_queue_depth {queue_depth}"])
+        metric("artliner_workers", "gauge", "Worker processes", [f"artliner_workers {self.workers}"])
+        metric("artliner_busy_workers", "gauge", "Workers currently rendering a batch",
+               [f"artliner_busy_workers {inflight}"])
+        metric("artliner_worker_utilization", "gauge", "Fraction of worker time spent rendering since start",
+               [f"artliner_worker_utilization {self.utilization():.4f}"])
+        metric("artliner_responses_total", "counter", "HTTP responses by status",
+               [f'artliner_responses_total{{status="{status}"}} {count}'
+                for status, count in sorted(self.responses.items())])
+        metric("artliner_coalesced_requests_total", "counter", "Requests served by an identical request's render",
+               [f"artliner_coalesced_requests_total {self.coalesced}"])
+        metric("artliner_request_latency_seconds", "histogram", "End-to-end /render latency",
+               self.latency.lines("artliner_request_latency_seconds"))
+        metric("artliner_queue_wait_seconds", "histogram", "Time from arrival to dispatch",
+               self.queue_wait.lines("artliner_queue_wait_seconds"))
+        metric("artliner_batch_render_seconds", "histogram", "Worker time per batch",
+               self.render_time.lines("artliner_batch_render_seconds"))
+        metric("artliner_batch_size", "histogram", "Distinct requests per batch",
+               self.batch_size.lines("artliner_batch_size"))
+        return "\n".join(lines) + "\n"
+
+
+class RenderServer:
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                 timeout=DEFAULT_TIMEOUT, max_body=DEFAULT_MAX_BODY):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.batch_size = max(1, batch_size)
+        self.timeout = timeout
+        self.max_body = max_body
+        self.metrics = Metrics(self.workers)
+        self.inflight = 0
+        self._queue = None
+        self._slots = None
+        self._pool = None
+        self._dispatcher = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(self.queue_size)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def close(self):
+        self._dispatcher.cancel()
+        try:
+            await self._dispatcher
+        except asyncio.CancelledError:
+            pass
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, request, timeout=None):
+        """
+        Queue a request and wait for its (status, payload).
+
+        Raises Overloaded when the queue is full and asyncio.TimeoutError when
+        the request is not answered within the timeout.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((request, future, time.monotonic()))
+        except asyncio.QueueFull:
+            raise Overloaded(f"{self.queue_size} requests already queued")
+        # On timeout wait_for cancels the future, so the dispatcher skips it
+        # if it is still queued
+        return await asyncio.wait_for(future, timeout or self.timeout)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            self.inflight += 1
+            # Only coalesce the backlog that idle workers could not pick up, so
+            # batching never serializes work that could run in parallel
+            extra = min(self.batch_size - 1, self._queue.qsize() - (self.workers - self.inflight))
+            for _ in range(max(0, extra)):
+                batch.append(self._queue.get_nowait())
+
+            now = time.monotonic()
+            waiting = {}
+            for request, future, queued in batch:
+                if future.done():
+                    continue  # Timed out while queued
+                self.metrics.queue_wait.observe(now - queued)
+                waiting.setdefault(request, []).append(future)
+            if not waiting:
+                self._release()
+                continue
+
+            self.metrics.batch_size.observe(len(waiting))
+            self.metrics.coalesced += sum(len(futures) - 1 for futures in waiting.values())
+            task = loop.run_in_executor(self._pool, render_batch, list(waiting))
+            task.add_done_callback(partial(self._deliver, waiting))
+
+    def _release(self):
+        self.inflight -= 1
+        self._slots.release()
+
+    def _deliver(self, waiting, task):
+        self._release()
+        if task.cancelled():
+            results = [(500, "Render cancelled")] * len(waiting)
+        elif task.exception() is not None:
+            results = [(500, str(task.exception()))] * len(waiting)
+        else:
+            results, busy = task.result()
+            self.metrics.busy_seconds += busy
+            self.metrics.render_time.observe(busy)
+        for futures, result in zip(waiting.values(), results):
+            for future in futures:
+                if not future.done():
+                    future.set_result(result)
+
+    async def handle_render(self, query, body):
+        start = time.monotonic()
+        try:
+            request = request_from_query(query, body)
+            timeout = min(float(parse_qs(query).get("timeout", [self.timeout])[-1]), self.timeout)
+        except ValueError as e:
+            return 400, "text/plain", str(e).encode(), {}
+        try:
+            status, payload = await self.submit(request, timeout)
+        except Overloaded as e:
+            return 503, "text/plain", str(e).encode(), {"Retry-After": "1"}
+        except asyncio.TimeoutError:
+            return 504, "text/plain", b"Render timed out", {}
+        finally:
+            self.metrics.latency.observe(time.monotonic() - start)
+        if status != 200:
+            return status, "text/plain", payload.encode(), {}
+        return 200, request.content_type, payload, {}
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == "/render":
+            if method != "POST":
+                return 405, "text/plain", b"Use POST", {"Allow": "POST"}
+            return await self.handle_render(url.query, body)
+        if url.path == "/metrics":
+            text = self.metrics.exposition(self._queue.qsize(), self.inflight)
+            return 200, "text/plain; version=0.0.4", text.encode(), {}
+        if url.path == "/health":
+            return 200, "text/plain", b"ok", {}
+        return 404, "text/plain", b"Not found", {}
+
+    async def handle_connection(self, reader, writer):
+        """
+        Minimal HTTP/1.1 connection handler with keep-alive
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, "text/plain", b"Malformed request line", {}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if "transfer-encoding" in headers:
+                    await self._respond(writer, 400, "text/plain", b"Chunked bodies are not supported", {}, False)
+                    break
+                length = int(headers.get("content-length", 0))
+                if length > self.max_body:
+                    await self._respond(writer, 413, "text/plain", b"Image too large", {}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, content_type, payload, extra = await self.route(method, target, body)
+                await self._respond(writer, status, content_type, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, content_type, payload, extra, keep_alive):
+        self.metrics.responses[status] = self.metrics.responses.get(status, 0) + 1
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(payload)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **extra,
+        }
+        head = f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + payload)
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, stop=None, **kwargs):
+    """
+    Run the service until stop (an asyncio.Event) is set or, on the main
+    thread, SIGINT/SIGTERM arrives
+    """
+    server = RenderServer(**kwargs)
+    await server.start()
+    tcp = await asyncio.start_server(server.handle_connection, host, port)
+    logging.info(f"Render service listening on http://{host}:{port} with {server.workers} workers")
+    stop = stop or asyncio.Event()
+    # Shut the pool down cleanly on SIGTERM/SIGINT so no workers are orphaned.
+    # Only the main thread can install signal handlers.
+    if threading.current_thread() is threading.main_thread():
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+    try:
+        async with tcp:
+            await stop.wait()
+    finally:
+        await server.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Serve line-art conversion over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Queued requests before answering 503")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Most requests coalesced into one worker task")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-request timeout in seconds")
+    parser.add_argument("--max-body-mb", type=float, default=DEFAULT_MAX_BODY / 2**20,
+                        help="Largest accepted upload")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, queue_size=args.queue_size,
+                          batch_size=args.batch_size, timeout=args.timeout,
+                          max_body=int(args.max_body_mb * 2**20)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
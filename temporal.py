@@ -0,0 +1,275 @@
+"""
+Incremental rendering of frame sequences.
+
+Screen recordings and turntable shots change little from one frame to the
+next, yet engine.render() redoes Canny, dilation and styling on every pixel.
+TemporalRenderer splits each frame into square tiles, compares them with the
+previous frame and only reruns the pipeline where something changed:
+
+* Canny candidates (Canny(low, low)) and strong pixels are local, so they are
+  recomputed for the changed tiles plus CANNY_HALO pixels around them
+* hysteresis is not local (see tiles.py), so the candidate components touching
+  a changed area are relabelled in a window that grows until their status
+  beyond it cannot have changed (see _update_edges); everything else keeps its
+  previous edges
+* dilation, style and color mode are rerun around the tiles whose edges changed,
+  with the post-Canny halo
+
+A tile counts as changed when any pixel differs from the reference frame by
+more than `threshold`. Tiles below the threshold keep their old pixels in the
+reference, so slow drift still triggers a re-render once it adds up, and the
+output is engine.render() of the reference frame. With threshold 0 the
+reference is the current frame, so the output matches a full render of every
+frame; `python bench.py --only verify` checks this with verify_temporal.
+"""
+import logging
+
+import cv2
+import numpy as np
+
+from engine import adjust_brightness, finish_edges, gradient_magnitude, render
+from tiles import CANNY_HALO, _label, post_canny_halo
+
+DEFAULT_TILE = 64
+
+# Margin (in tiles) of the first hysteresis window around a changed area; it
+# grows by this factor while components still cross the window border
+WINDOW_GROWTH = 4
+
+# Above this fraction of changed tiles (a scene cut), a full render is cheaper
+FULL_RENDER_FRACTION = 0.5
+
+
+def tile_max(diff, tile):
+    """
+    Largest value of diff in every tile x tile block. diff must be padded to a
+    whole number of tiles (see TemporalRenderer._tile_changes).
+    """
+    rows, cols = diff.shape[0] // tile, diff.shape[1] // tile
+    return diff.reshape(rows, tile, cols * tile).max(axis=1).reshape(rows, cols, tile).max(axis=2)
+
+
+def tile_runs(mask, tile, shape):
+    """
+    Merge horizontally adjacent set tiles into (y0, y1, x0, x1) pixel rectangles
+    """
+    height, width = shape
+    runs = []
+    for ty, row in enumerate(mask):
+        cols = np.flatnonzero(row)
+        if not len(cols):
+            continue
+        # Split the set columns wherever there is a gap
+        breaks = np.flatnonzero(np.diff(cols) > 1)
+        for start, end in zip(np.r_[cols[0], cols[breaks + 1]], np.r_[cols[breaks], cols[-1]]):
+            runs.append((ty * tile, min((ty + 1) * tile, height), start * tile, min((end + 1) * tile, width)))
+    return runs
+
+
+def tile_groups(mask, tile, shape):
+    """
+    Pixel bounding rectangles of the 8-connected groups of set tiles
+    """
+    height, width = shape
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+    groups = []
+    for x, y, w, h, _ in stats[1:count]:
+        groups.append((y * tile, min((y + h) * tile, height), x * tile, min((x + w) * tile, width)))
+    return groups
+
+
+def contains(outer, inner):
+    return outer[0] <= inner[0] and inner[1] <= outer[1] and outer[2] <= inner[2] and inner[3] <= outer[3]
+
+
+def grow(rect, margin, shape):
+    y0, y1, x0, x1 = rect
+    return max(0, y0 - margin), min(shape[0], y1 + margin), max(0, x0 - margin), min(shape[1], x1 + margin)
+
+
+def candidate_maps(img_cv, thresholds):
+    """
+    Canny candidates (uint8 0/255) and strong pixels (bool) for a whole array;
+    Canny(img, low, high) keeps the candidate components with a strong pixel
+    """
+    low, high = thresholds
+    weak = cv2.Canny(img_cv, low, low)
+    return weak, (weak > 0) & (gradient_magnitude(img_cv) > high)
+
+
+class TemporalRenderer:
+    """
+    Renders a sequence of same-sized grayscale frames, reusing unchanged tiles
+    """
+    def __init__(self, params, tile=DEFAULT_TILE, threshold=0):
+        if tile < 1:
+            raise ValueError(f"tile must be positive, got {tile}")
+        self.params = params
+        self.tile = tile
+        self.threshold = threshold
+        self.frames = 0
+        self.tiles = 0
+        self.reused = 0
+        self.reference = None  # Frame the current output is a render of
+
+    @property
+    def reuse_fraction(self):
+        return self.reused / self.tiles if self.tiles else 0.0
+
+    def stats(self):
+        return {"frames": self.frames, "tiles": self.tiles, "tiles_reused": self.reused,
+                "reuse_fraction": self.reuse_fraction}
+
+    def render(self, gray):
+        """
+        Render the next frame; returns a new array each time
+        """
+        gray = np.ascontiguousarray(gray)
+        if self.reference is None or self.reference.shape != gray.shape:
+            self._render_full(gray)
+            self.tiles += self._diff.size // self.tile ** 2
+        else:
+            self._render_changes(gray)
+        self.frames += 1
+        return self.output.copy()
+
+    def _tile_changes(self, a, b, threshold):
+        """
+        Tiles where a and b differ by more than threshold
+        """
+        height, width = a.shape
+        cv2.absdiff(a, b, dst=self._diff[:height, :width])
+        return tile_max(self._diff, self.tile) > threshold
+
+    def _render_full(self, gray):
+        self.reference = gray.copy()
+        # Zero-padded to whole tiles so tile_max can reshape it
+        self._diff = np.zeros((-(-gray.shape[0] // self.tile) * self.tile,
+                               -(-gray.shape[1] // self.tile) * self.tile), np.uint8)
+        img_cv = adjust_brightness(self.reference, self.params.brightness)
+        self.weak, self.strong = candidate_maps(img_cv, self.params.thresholds)
+        self.edges = cv2.Canny(img_cv, *self.params.thresholds)
+        self.output = finish_edges(self.edges, self.params)
+        if self.output is self.edges:
+            # Nothing to do after Canny; the output is updated separately
+            self.output = self.edges.copy()
+
+    def _render_changes(self, gray):
+        shape = gray.shape
+        changed = self._tile_changes(gray, self.reference, self.threshold)
+        self.tiles += changed.size
+        if not changed.any():
+            self.reused += changed.size
+            return
+        if changed.mean() > FULL_RENDER_FRACTION:
+            self._render_full(gray)
+            return
+
+        previous_edges = self.edges.copy()
+        runs = tile_runs(changed, self.tile, shape)
+        for y0, y1, x0, x1 in runs:
+            self.reference[y0:y1, x0:x1] = gray[y0:y1, x0:x1]
+        for rect in runs:
+            self._update_candidates(rect)
+        rects = [grow(rect, CANNY_HALO, shape) for rect in tile_groups(changed, self.tile, shape)]
+        for rect in rects:
+            self._update_edges(rect, previous_edges, rects)
+
+        edges_changed = self._tile_changes(self.edges, previous_edges, 0)
+        for rect in tile_runs(edges_changed, self.tile, shape):
+            self._update_output(rect)
+        self.reused += int(np.count_nonzero(~(changed | edges_changed)))
+
+    def _update_candidates(self, rect):
+        """
+        Recompute candidates and strong pixels within CANNY_HALO of rect
+        """
+        shape = self.reference.shape
+        ay0, ay1, ax0, ax1 = grow(rect, 2 * CANNY_HALO, shape)
+        wy0, wy1, wx0, wx1 = grow(rect, CANNY_HALO, shape)
+        img_cv = adjust_brightness(self.reference[ay0:ay1, ax0:ax1], self.params.brightness)
+        weak, strong = candidate_maps(img_cv, self.params.thresholds)
+        inner = (slice(wy0 - ay0, wy1 - ay0), slice(wx0 - ax0, wx1 - ax0))
+        self.weak[wy0:wy1, wx0:wx1] = weak[inner]
+        self.strong[wy0:wy1, wx0:wx1] = strong[inner]
+
+    def _update_edges(self, rect, previous_edges, rects):
+        """
+        Redo hysteresis for every candidate component that touches rect, one
+        of this frame's changed areas `rects`.
+
+        Candidates only changed inside rects, so a component that does not
+        come within one pixel of any of them is the same as before and keeps
+        its edges. A touched component is labelled inside a window around
+        rect. If it crosses the window border, its status outside still
+        matches the old edges there when
+        - it is kept (it has a strong pixel in the window) and the pieces
+          outside were edges before: they stay edges, or
+        - it is dropped, the pieces outside were not edges before and every
+          changed area lies inside the window: the pieces outside are made of
+          unchanged candidates, so they had no strong pixel before and have
+          none now.
+        A dropped component may otherwise reach a strong pixel that appeared
+        in another changed area, so in every other case the window grows and
+        we look again.
+        """
+        shape = self.weak.shape
+        ty0, ty1, tx0, tx1 = grow(rect, 1, shape)
+        # The window ring must lie outside the changed candidates
+        margin = max(self.tile, 2)
+        while True:
+            wy0, wy1, wx0, wx1 = window = grow(rect, margin, shape)
+            labels = _label(self.weak[wy0:wy1, wx0:wx1])
+            touched = np.zeros(int(labels.max()) + 1, bool)
+            touched[labels[ty0 - wy0:ty1 - wy0, tx0 - wx0:tx1 - wx0]] = True
+            keep = np.zeros(len(touched), bool)
+            keep[labels[self.strong[wy0:wy1, wx0:wx1]]] = True
+
+            # Window border rows/columns that are not the image border
+            ring = [np.s_[0, :]] if wy0 > 0 else []
+            ring += [np.s_[-1, :]] if wy1 < shape[0] else []
+            ring += [np.s_[:, 0]] if wx0 > 0 else []
+            ring += [np.s_[:, -1]] if wx1 < shape[1] else []
+            old = previous_edges[wy0:wy1, wx0:wx1]
+            ring_labels = np.concatenate([labels[side] for side in ring]) if ring else np.zeros(0, np.int32)
+            ring_old = np.concatenate([old[side] for side in ring]) > 0 if ring else np.zeros(0, bool)
+            crossing = touched[ring_labels] & (ring_labels > 0)
+            dropped = np.any(crossing & ~keep[ring_labels])
+            if (not np.any(crossing & (ring_old != keep[ring_labels]))
+                    and not (dropped and not all(contains(window, grow(other, 2, shape)) for other in rects))):
+                break
+            # A component's status beyond the window may change: look further
+            margin *= WINDOW_GROWTH
+            logging.debug(f"Hysteresis window {window} too small, growing to a {margin}-pixel margin")
+
+        # Touched components are kept or dropped afresh and non-candidates
+        # (label 0, which only changed inside rect) are cleared
+        touched[0] = True
+        keep[0] = False
+        lut = keep.astype(np.uint8) * np.uint8(255)
+        np.copyto(self.edges[wy0:wy1, wx0:wx1], lut[labels], where=touched[labels])
+
+    def _update_output(self, rect):
+        """
+        Rerun dilation, style and color mode around rect
+        """
+        shape = self.edges.shape
+        halo = post_canny_halo(self.params)
+        ay0, ay1, ax0, ax1 = grow(rect, 2 * halo, shape)
+        wy0, wy1, wx0, wx1 = grow(rect, halo, shape)
+        out = finish_edges(self.edges[ay0:ay1, ax0:ax1], self.params)
+        self.output[wy0:wy1, wx0:wx1] = out[wy0 - ay0:wy1 - ay0, wx0 - ax0:wx1 - ax0]
+
+
+def verify_temporal(frames, params, tile=DEFAULT_TILE):
+    """
+    Check that incremental rendering with threshold 0 matches engine.render()
+    on every frame
+    """
+    renderer = TemporalRenderer(params, tile)
+    for index, gray in enumerate(frames):
+        mismatched = int(np.count_nonzero(renderer.render(gray) != render(gray, params)))
+        if mismatched:
+            logging.error(f"Incremental render of frame {index} differs in {mismatched} pixels")
+            return False
+    return True
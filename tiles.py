@@ -0,0 +1,348 @@
+"""
+Tiled, memory-bounded rendering for very large images.
+
+The image is processed in full-width horizontal strips. Every local step reads
+a halo of extra rows sized to its kernel, so strips join without seams:
+
+* Sobel + non-maximum suppression in Canny: CANNY_HALO rows
+* dilation: thickness // 2 rows
+* style: the style's registered reach (Gaussian 5x5 -> 2, adaptive threshold
+  11x11 -> 5)
+
+Canny's hysteresis step is not local (a weak edge is kept if it is connected
+to a strong one anywhere in the image), so it is resolved exactly in two
+passes. Canny(low, low) gives every edge candidate and Canny(high, high) the
+strong ones; the final edges are the 8-connected candidate components that
+contain a strong pixel. Pass one labels the candidates strip by strip and
+joins components across strip boundaries with a union-find; pass two emits
+the kept components and runs the remaining stages. The result is identical to
+engine.render() on the whole image.
+
+`gray` only has to support row slicing (a NumPy array or np.memmap), so the
+source does not need to be resident in memory either.
+"""
+import logging
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from engine import STYLE_STAGES, adjust_brightness, finish_edges, render, renders_binary
+from export import rgba_from_mask, transparency_mask
+from writers import open_writer
+
+# Rows of context needed by Sobel (3x3) plus non-maximum suppression
+CANNY_HALO = 2
+
+# Default working-set budget for a tiled render
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+# Rough working-set bytes per pixel of a strip (gray, brightness, two Canny
+# passes, int32 labels, OpenCV's internal Canny buffers, post-Canny window)
+BYTES_PER_PIXEL = 32
+
+MIN_STRIP_ROWS = 64
+
+
+def post_canny_halo(params):
+    return params.thickness // 2 + STYLE_STAGES[params.style].reach
+
+
+def strip_rows_for_budget(width, params, memory_budget=DEFAULT_MEMORY_BUDGET):
+    rows = memory_budget // max(1, width * BYTES_PER_PIXEL)
+    return max(MIN_STRIP_ROWS, post_canny_halo(params) + 1, int(rows))
+
+
+def strip_ranges(height, rows):
+    return [(y, min(y + rows, height)) for y in range(0, height, rows)]
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = np.zeros(1, np.int64)  # id 0 is the background
+
+    def add(self, count):
+        start = len(self.parent)
+        self.parent = np.concatenate([self.parent, np.arange(start, start + count, dtype=np.int64)])
+        return start - 1  # offset that maps local label n to global id offset + n
+
+    def find(self, x):
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def roots(self):
+        # Pointer jumping until every id points straight at its root
+        parent = self.parent.copy()
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                return parent
+            parent = grand
+
+
+def _candidates(gray, y0, y1, params):
+    """
+    Canny candidate and strong-edge maps for rows [y0, y1).
+
+    Candidates are Canny(low, low). A candidate is strong when its L1 Sobel
+    magnitude (the one Canny uses) exceeds the high threshold, which is the
+    same set Canny(high, high) returns, at the cost of two Sobel passes.
+    """
+    height = gray.shape[0]
+    a = max(0, y0 - CANNY_HALO)
+    b = min(height, y1 + CANNY_HALO)
+    img_cv = adjust_brightness(np.ascontiguousarray(gray[a:b]), params.brightness)
+    low, high = params.thresholds
+    weak = cv2.Canny(img_cv, low, low)[y0 - a:y1 - a]
+
+    core = img_cv[max(0, y0 - a - 1):y1 - a + 1]
+    top = 1 if y0 - a >= 1 else 0
+    dx = cv2.Sobel(core, cv2.CV_16S, 1, 0, ksize=3, borderType=cv2.BORDER_REPLICATE)
+    dy = cv2.Sobel(core, cv2.CV_16S, 0, 1, ksize=3, borderType=cv2.BORDER_REPLICATE)
+    magnitude = cv2.add(cv2.absdiff(dx, 0), cv2.absdiff(dy, 0), dtype=cv2.CV_32S)
+    strong = (weak > 0) & (magnitude[top:top + (y1 - y0)] > high)
+    return weak, strong
+
+
+def _label(weak):
+    _, labels = cv2.connectedComponents(weak, connectivity=8, ltype=cv2.CV_32S)
+    return labels
+
+
+def ordered_map(fn, items, workers=1):
+    """
+    Like map(), but runs fn on a thread pool with a bounded look-ahead.
+
+    Results come back in input order and at most 2 * workers are held at once,
+    which keeps memory flat. OpenCV releases the GIL, so strips really do run
+    in parallel.
+    """
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tile") as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _scan_strip(gray, params, strip):
+    """
+    Pass-one work for a single strip (safe to run on any thread)
+    """
+    y0, y1 = strip
+    weak, strong = _candidates(gray, y0, y1, params)
+    labels = _label(weak)
+    return (np.packbits(weak > 0).tobytes(), int(labels.max()), np.unique(labels[strong]),
+            labels[0].copy(), labels[-1].copy())
+
+
+def _resolve_hysteresis(gray, params, strips, spill, workers=1):
+    """
+    Pass one: return per-strip label offsets and the keep flag per global id.
+
+    The candidate maps are bit-packed into `spill` (a temporary file) so pass
+    two can re-label them without running Canny again.
+    """
+    uf = _UnionFind()
+    offsets = []
+    strong_ids = []
+    previous_row = None
+
+    scans = ordered_map(lambda strip: _scan_strip(gray, params, strip), strips, workers)
+    for packed, count, strong_labels, first_labels, last_labels in scans:
+        spill.write(packed)
+        offset = uf.add(count)
+        offsets.append(offset)
+        strong_ids.append(strong_labels + offset)
+
+        # Join components that touch across the strip boundary (8-connected)
+        if previous_row is not None:
+            first_row = np.where(first_labels > 0, first_labels + offset, 0)
+            for shift in (-1, 0, 1):
+                above = previous_row[max(0, shift):len(previous_row) + min(0, shift)]
+                below = first_row[max(0, -shift):len(first_row) + min(0, -shift)]
+                touching = (above > 0) & (below > 0)
+                if touching.any():
+                    pairs = np.unique(np.stack([above[touching], below[touching]], axis=1), axis=0)
+                    for a, b in pairs:
+                        uf.union(int(a), int(b))
+        previous_row = np.where(last_labels > 0, last_labels + offset, 0)
+
+    roots = uf.roots()
+    keep_root = np.zeros(len(roots), bool)
+    strong_all = np.concatenate(strong_ids) if strong_ids else np.zeros(0, np.int64)
+    keep_root[roots[strong_all]] = True
+    keep = keep_root[roots]
+    keep[0] = False
+    return offsets, keep
+
+
+def _read_candidates(width, strips, spill):
+    spill.seek(0)
+    for y0, y1 in strips:
+        count = (y1 - y0) * width
+        yield y1 - y0, np.frombuffer(spill.read((count + 7) // 8), np.uint8)
+
+
+def _edge_strips(width, strips, offsets, keep, spill, workers=1):
+    """
+    Pass two: yield the final Canny edges for each strip
+    """
+    def keep_edges(job):
+        (rows, packed), offset = job
+        weak = np.unpackbits(packed, count=rows * width).reshape(rows, width) * np.uint8(255)
+        labels = _label(weak)
+        # Per-strip lookup table: local label -> 0 or 255
+        lut = keep[offset:offset + int(labels.max()) + 1].astype(np.uint8) * np.uint8(255)
+        lut[0] = 0
+        return lut[labels]
+
+    yield from ordered_map(keep_edges, zip(_read_candidates(width, strips, spill), offsets), workers)
+
+
+def strip_rows(height, width, params, memory_budget=DEFAULT_MEMORY_BUDGET, workers=1):
+    """
+    Strip height for a render: bounded by the memory budget shared between
+    workers, and small enough to give every worker at least two strips
+    """
+    rows = strip_rows_for_budget(width, params, memory_budget // max(1, workers * 2))
+    if workers > 1:
+        rows = min(rows, -(-height // (workers * 2)))
+    return max(rows, MIN_STRIP_ROWS, post_canny_halo(params) + 1)
+
+
+def iter_edge_strips(gray, params, rows=None, memory_budget=DEFAULT_MEMORY_BUDGET, workers=1):
+    """
+    Yield (y0, Canny edge rows) for the whole image, top to bottom; the edges
+    are exactly those engine.render() dilates and styles
+    """
+    height, width = gray.shape[:2]
+    rows = rows or strip_rows(height, width, params, memory_budget, workers)
+    strips = strip_ranges(height, rows)
+    with tempfile.TemporaryFile() as spill:
+        offsets, keep = _resolve_hysteresis(gray, params, strips, spill, workers)
+        for (y0, _), edges in zip(strips, _edge_strips(width, strips, offsets, keep, spill, workers)):
+            yield y0, edges
+
+
+def iter_render_strips(gray, params, rows=None, memory_budget=DEFAULT_MEMORY_BUDGET, workers=1):
+    """
+    Yield (y0, rendered rows) for the whole image, top to bottom.
+
+    With workers > 1 the per-strip work runs on a thread pool; the output is
+    identical to the single-threaded result.
+    """
+    height, width = gray.shape[:2]
+    rows = rows or strip_rows(height, width, params, memory_budget, workers)
+    halo = post_canny_halo(params)
+    if rows < halo:
+        raise ValueError(f"Strips of {rows} rows are smaller than the {halo}-row halo")
+    strips = strip_ranges(height, rows)
+    logging.info(f"Tiled render: {width}x{height} in {len(strips)} strips of {rows} rows, {workers} worker(s)")
+
+    with tempfile.TemporaryFile() as spill:
+        offsets, keep = _resolve_hysteresis(gray, params, strips, spill, workers)
+        edge_iter = _edge_strips(width, strips, offsets, keep, spill, workers)
+        yield from _finish_strips(edge_iter, params, strips, halo, workers)
+
+
+def _halo_blocks(edge_iter, strips, halo):
+    """
+    Yield (y0, y1, a, block) where block holds edge rows [a, ...) covering the
+    strip plus its halo
+    """
+    # Keep the previous, current and next strip of edges so each strip sees its halo
+    window = []
+    for index, (y0, y1) in enumerate(strips):
+        if index == 0:
+            window.append(next(edge_iter))
+        if index + 1 < len(strips):
+            window.append(next(edge_iter))
+        start = strips[index - 1][0] if index > 0 else y0
+        block = np.concatenate(window) if len(window) > 1 else window[0]
+
+        a = max(start, y0 - halo)
+        b = min(y1 + halo, start + len(block))
+        yield y0, y1, a, block[a - start:b - start]
+
+        if index > 0:
+            window.pop(0)
+
+
+def _finish_strips(edge_iter, params, strips, halo, workers=1):
+    """
+    Run dilation, style and color mode on the edge strips, with halos
+    """
+    def finish(job):
+        y0, y1, a, edges = job
+        edges = finish_edges(edges, params)
+        return y0, edges[y0 - a:y1 - a]
+
+    yield from ordered_map(finish, _halo_blocks(edge_iter, strips, halo), workers)
+
+
+def render_tiled(gray, params, rows=None, memory_budget=DEFAULT_MEMORY_BUDGET, workers=1):
+    """
+    Render into one array (mainly for checking against engine.render)
+    """
+    out = np.empty(gray.shape[:2], np.uint8)
+    for y0, strip in iter_render_strips(gray, params, rows, memory_budget, workers):
+        out[y0:y0 + len(strip)] = strip
+    return out
+
+
+def verify_tiled(gray, params, workers=1, rows=None):
+    """
+    Check that the (parallel) tiled render matches engine.render() exactly
+    """
+    expected = render(gray, params)
+    tiled = render_tiled(gray, params, rows=rows, workers=workers)
+    mismatched = int(np.count_nonzero(tiled != expected))
+    if mismatched:
+        logging.error(f"Tiled render with {workers} worker(s) differs in {mismatched} pixels")
+    return mismatched == 0
+
+
+def export_tiled(gray, params, output_path, fmt="png", transparent=False,
+                 rows=None, memory_budget=DEFAULT_MEMORY_BUDGET, workers=1, profile=None):
+    """
+    Render and stream straight to a PNG/TIFF file at the source resolution.
+
+    With a bilevel export.EncoderProfile, transparent exports and styles
+    that always render pure black and white are written 1-bit, as save_image
+    and save_transparent would write them; other styles stay 8-bit.
+    """
+    height, width = gray.shape[:2]
+    bilevel = profile is not None and profile.bilevel and (transparent or renders_binary(params))
+    palette = None
+    if transparent and bilevel:
+        # Index 0 is the transparent background, index 1 the line color
+        line = 0 if params.color_mode == "black_on_white" else 255
+        mode, palette = "P", [(255 - line,) * 3, (line,) * 3]
+    elif transparent:
+        mode = "RGBA"
+    else:
+        mode = "1" if bilevel else "L"
+    with open_writer(output_path, "png" if transparent else fmt, width, height, mode, profile, palette) as writer:
+        for _, strip in iter_render_strips(gray, params, rows, memory_budget, workers):
+            if transparent:
+                mask = transparency_mask(strip, params.color_mode)
+                strip = mask if bilevel else rgba_from_mask(mask, params.color_mode)
+            writer.write_rows(strip)
+    logging.info(f"Tiled export saved: {output_path} ({width}x{height})")
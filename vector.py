@@ -0,0 +1,264 @@
+"""
+Vector (SVG / PDF path) export.
+
+The Canny edge map is traced into polylines and written as stroked paths, so
+the file size follows the amount of line work rather than the resolution, and
+the drawing can be printed at any size. Dilation becomes the stroke width
+(thickness, in source pixels) with round caps and joins. Styles are raster
+effects and are not traced; the color mode picks the stroke and background
+colors.
+
+Tracing runs cv2.findContours on the 1-pixel edges. The contour of a thin line
+walks along it and back, and loops are traced twice, once from each side, so
+every pixel after its first visit is dropped in one vectorized pass. What is
+left is split into open polylines, and each is simplified with approxPolyDP.
+The edge map is traced in horizontal strips on a thread pool. Each strip
+overlaps the previous one by a row so lines join across the boundary. Images
+of export.TILED_EXPORT_PIXELS and up get their edges from the tiled two-pass
+Canny (tiles.iter_edge_strips), so the full edge map is never held in memory.
+"""
+import logging
+import os
+import time
+import zlib
+
+import cv2
+import numpy as np
+
+from engine import adjust_brightness, detect_edges
+from export import PDF_RESOLUTION, TILED_EXPORT_PIXELS
+from tiles import DEFAULT_MEMORY_BUDGET, iter_edge_strips, ordered_map, strip_ranges
+
+VECTOR_EXTENSIONS = ('.svg', '.pdf')
+
+# Largest distance (source pixels) a simplified polyline may stray from the traced pixels
+SIMPLIFY_EPSILON = 0.75
+
+# Rows per strip when tracing an in-memory edge map
+TRACE_STRIP_ROWS = 256
+
+LINE_COLORS = {"black_on_white": (0, 255), "white_on_black": (255, 0)}  # (stroke, background)
+
+
+def trace_edges(edges, epsilon=SIMPLIFY_EPSILON, y_offset=0):
+    """
+    Trace a binary edge map into a list of (N, 2) int32 polylines of (x, y)
+    pixel coordinates, shifted down by y_offset
+    """
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
+    if not contours:
+        return []
+    lengths = np.fromiter((len(c) for c in contours), np.int64, len(contours))
+    points = np.concatenate(contours).reshape(-1, 2)
+
+    # Keep each pixel only where the tracing first reaches it
+    flat = points[:, 1].astype(np.int64) * edges.shape[1] + points[:, 0]
+    first = np.zeros(len(points), bool)
+    first[np.unique(flat, return_index=True)[1]] = True
+
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    contour_start = np.zeros(len(points), bool)
+    contour_start[starts] = True
+    # Runs of first visits, not crossing from one contour into the next
+    begins = first & (contour_start | ~np.roll(first, 1))
+    run_starts = np.flatnonzero(begins)
+    run_ends = np.flatnonzero(first & (np.roll(contour_start, -1) | ~np.roll(first, -1))) + 1
+    owner = np.searchsorted(ends, run_starts, side="right")
+
+    polylines = []
+    for s, e, c0, c1 in zip(run_starts, run_ends, starts[owner], ends[owner]):
+        # Reconnect to the pixel the run branches off from, and to the one it
+        # runs into unless that is just the way back
+        if s > c0:
+            s -= 1
+        if e < c1 and (e - s < 2 or (points[e] != points[e - 2]).any()):
+            e += 1
+        run = points[s:e]
+        if len(run) > 2:
+            # Simplify loops as closed curves: approxPolyDP needs a chord
+            if (run[0] == run[-1]).all():
+                run, loop = run[:-1], True
+            else:
+                loop = e - s == c1 - c0 and (np.abs(run[0] - run[-1]) <= 1).all()
+            run = cv2.approxPolyDP(run.reshape(-1, 1, 2), epsilon, loop).reshape(-1, 2)
+            if loop:
+                run = np.vstack([run, run[:1]])
+        polylines.append(run + np.int32((0, y_offset)))
+
+    # Pixels with all four neighbours set lie on no contour; draw them as dots
+    traced = np.zeros(edges.shape, np.uint8)
+    traced[points[:, 1], points[:, 0]] = 255
+    for y, x in np.argwhere(cv2.subtract(edges, traced)):
+        polylines.append(np.array([[x, y + y_offset]], np.int32))
+    return polylines
+
+
+def _overlapping_strips(edge_strips):
+    """
+    Prefix every strip with the last edge row of the previous one
+    """
+    previous = None
+    for y0, edges in edge_strips:
+        if previous is None:
+            yield y0, edges
+        else:
+            yield y0 - 1, np.vstack([previous, edges])
+        previous = edges[-1:].copy()
+
+
+def iter_polylines(gray, params, edges=None, workers=1, epsilon=SIMPLIFY_EPSILON,
+                   memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    Yield the traced polylines of each strip, top to bottom
+    """
+    height, width = gray.shape[:2]
+    if edges is None and width * height >= TILED_EXPORT_PIXELS:
+        jobs = _overlapping_strips(iter_edge_strips(gray, params, memory_budget=memory_budget, workers=workers))
+    else:
+        if edges is None:
+            edges = detect_edges(adjust_brightness(gray, params.brightness), params.thresholds)
+        jobs = ((max(0, y0 - 1), edges[max(0, y0 - 1):y1]) for y0, y1 in strip_ranges(height, TRACE_STRIP_ROWS))
+    yield from ordered_map(lambda job: trace_edges(job[1], epsilon, job[0]), jobs, workers)
+
+
+def _hex(value):
+    return "#" + f"{value:02x}" * 3
+
+
+class SVGPathWriter:
+    """
+    Writes polylines as one SVG <path> per strip; `size` sets the rendered
+    size, the viewBox stays in source pixels
+    """
+    def __init__(self, path, source_size, size, thickness, color_mode, transparent=False, dpi=None):
+        stroke, background = LINE_COLORS[color_mode]
+        width, height = size
+        if dpi:
+            width, height = f"{width / dpi:g}in", f"{height / dpi:g}in"
+        self._file = open(path, "w", encoding="ascii")
+        self._file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                         f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                         f'viewBox="0 0 {source_size[0]} {source_size[1]}">\n')
+        if not transparent:
+            self._file.write(f'<rect width="100%" height="100%" fill="{_hex(background)}"/>\n')
+        # Pixel centres sit half a pixel in from the pixel grid
+        self._file.write(f'<g fill="none" stroke="{_hex(stroke)}" stroke-width="{thickness}" '
+                         'stroke-linecap="round" stroke-linejoin="round" transform="translate(.5 .5)">\n')
+
+    def write(self, polylines):
+        if not polylines:
+            return
+        parts = []
+        for run in polylines:
+            deltas = np.diff(run, axis=0).ravel() if len(run) > 1 else (0, 0)
+            parts.append(f"M{run[0, 0]} {run[0, 1]}l" + ("%d %d " * (len(deltas) // 2)) % tuple(deltas))
+        self._file.write(f'<path d="{"".join(parts)}"/>\n')
+
+    def close(self):
+        self._file.write("</g>\n</svg>\n")
+        self._file.close()
+
+
+class PDFPathWriter:
+    """
+    Writes polylines as stroked paths on a one-page PDF. The page is `size`
+    pixels at dpi (PDF_RESOLUTION when None); the content stream is deflated
+    as it is written, so it is never held in memory.
+    """
+    def __init__(self, path, source_size, size, thickness, color_mode, transparent=False, dpi=None):
+        stroke, background = LINE_COLORS[color_mode]
+        points_per_pixel = 72.0 / (dpi or PDF_RESOLUTION)
+        page_width, page_height = size[0] * points_per_pixel, size[1] * points_per_pixel
+        self._file = open(path, "wb")
+        self._offsets = []
+        self._deflate = zlib.compressobj()
+        self._length = 0
+
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(b"<< /Type /Catalog /Pages 2 0 R >>")
+        self._object(b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>")
+        self._object(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width:.3f} {page_height:.3f}] "
+                     f"/Contents 4 0 R /Resources << >> >>".encode())
+        self._offsets.append(self._file.tell())
+        self._file.write(b"4 0 obj\n<< /Length 5 0 R /Filter /FlateDecode >>\nstream\n")
+
+        # Source pixel coordinates, y down, scaled onto the page
+        sx, sy = page_width / source_size[0], page_height / source_size[1]
+        header = f"q {sx:.6f} 0 0 {-sy:.6f} 0 {page_height:.3f} cm\n"
+        if not transparent:
+            header += f"{background / 255:g} g 0 0 {source_size[0]} {source_size[1]} re f\n"
+        header += f"{stroke / 255:g} G {thickness} w 1 J 1 j 1 0 0 1 0.5 0.5 cm\n"
+        self._content(header)
+
+    def _object(self, body):
+        self._offsets.append(self._file.tell())
+        self._file.write(f"{len(self._offsets)} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _content(self, text):
+        data = self._deflate.compress(text.encode("ascii"))
+        self._file.write(data)
+        self._length += len(data)
+
+    def write(self, polylines):
+        if not polylines:
+            return
+        parts = []
+        for run in polylines:
+            if len(run) == 1:
+                run = np.vstack([run, run])  # A dot: zero-length segment with round caps
+            parts.append(("%d %d m " + "%d %d l " * (len(run) - 1)) % tuple(run.ravel()))
+        self._content("".join(parts) + "S\n")
+
+    def close(self):
+        self._content("Q\n")
+        tail = self._deflate.flush()
+        self._file.write(tail)
+        self._length += len(tail)
+        self._file.write(b"\nendstream\nendobj\n")
+        self._object(str(self._length).encode())
+        xref = self._file.tell()
+        self._file.write(f"xref\n0 {len(self._offsets) + 1}\n0000000000 65535 f \n".encode())
+        for offset in self._offsets:
+            self._file.write(f"{offset:010d} 00000 n \n".encode())
+        self._file.write(f"trailer\n<< /Size {len(self._offsets) + 1} /Root 1 0 R >>\n"
+                         f"startxref\n{xref}\n%%EOF\n".encode())
+        self._file.close()
+
+
+def open_vector_writer(path, source_size, size, thickness, color_mode, transparent=False, dpi=None):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".svg":
+        return SVGPathWriter(path, source_size, size, thickness, color_mode, transparent, dpi)
+    if ext == ".pdf":
+        return PDFPathWriter(path, source_size, size, thickness, color_mode, transparent, dpi)
+    raise ValueError(f"Unsupported vector output: {ext or path}")
+
+
+def export_vector(gray, params, output_path, size=None, dpi=None, transparent=False, edges=None, workers=None,
+                  epsilon=SIMPLIFY_EPSILON, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """
+    Trace gray's line art and save it as SVG or vector PDF (by extension).
+
+    size is the drawing size in pixels (default: the source size) and only
+    scales the output. edges may be the Canny edges of gray at params (e.g.
+    from a StageCache), saving the edge detection. Returns a summary dict.
+    """
+    start = time.perf_counter()
+    height, width = gray.shape[:2]
+    size = tuple(size or (width, height))
+    workers = workers or os.cpu_count() or 1
+    writer = open_vector_writer(output_path, (width, height), size, params.thickness, params.color_mode,
+                                transparent, dpi)
+    polylines = points = 0
+    try:
+        for strip in iter_polylines(gray, params, edges, workers, epsilon, memory_budget):
+            writer.write(strip)
+            polylines += len(strip)
+            points += sum(len(run) for run in strip)
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - start
+    logging.info(f"Vector export saved: {output_path} ({polylines} paths, {points} points, "
+                 f"{os.path.getsize(output_path) / 1e6:.2f} MB, {seconds:.2f}s)")
+    return {"polylines": polylines, "points": points, "bytes": os.path.getsize(output_path), "seconds": seconds}
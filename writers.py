@@ -0,0 +1,304 @@
+"""
+Streaming image writers.
+
+These writers accept an image a band of rows at a time, so an export never
+needs the whole picture in memory. They support 8-bit grayscale ("L") and
+RGBA output, which covers everything the line-art pipeline produces, plus the
+1-bit output of export.EncoderProfile.bilevel: "1" (black and white) and, for
+PNG, "P" (a two-color palette whose index 0 is transparent). 1-bit rows are
+passed as uint8 0/255 (0/nonzero for "P") and packed by the writer.
+"""
+import io
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image
+
+# Bytes of compressed data collected before an IDAT chunk is written
+PNG_CHUNK_BYTES = 1 << 20
+
+# Classic TIFF offsets are 32-bit; switch to BigTIFF well before that
+BIGTIFF_THRESHOLD = (1 << 32) - (1 << 28)
+
+MODE_CHANNELS = {"L": 1, "RGBA": 4, "1": 1, "P": 1}
+BILEVEL_MODES = ("1", "P")
+
+# Strip compressions coded by Pillow (libtiff), one strip at a time
+PILLOW_TIFF_COMPRESSIONS = ("group4", "tiff_lzw", "tiff_adobe_deflate")
+
+
+def pack_bilevel(rows):
+    """
+    Pack uint8 rows (0 = bit off, anything else = bit on) to 1 bit per pixel,
+    each row padded to a whole byte
+    """
+    return np.packbits(rows != 0, axis=1)
+
+
+def check_bilevel(rows):
+    if np.any((rows != 0) & (rows != 255)):
+        raise ValueError("1-bit output needs rows that are pure black (0) and white (255)")
+
+
+class StripedPNGWriter:
+    """
+    Write a PNG band by band (no row filtering, streaming zlib). Mode "P"
+    takes the two (r, g, b) palette colors; index 0 is transparent.
+    """
+    def __init__(self, path, width, height, mode="L", compress_level=6, strategy=zlib.Z_DEFAULT_STRATEGY,
+                 palette=None):
+        if mode not in MODE_CHANNELS:
+            raise ValueError(f"Unsupported mode for PNG writer: {mode}")
+        if mode == "P" and (palette is None or len(palette) != 2):
+            raise ValueError("Mode P needs a palette of two colors")
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.channels = MODE_CHANNELS[mode]
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level, zlib.DEFLATED, zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL,
+                                            strategy)
+        self._pending = []
+        self._pending_bytes = 0
+        self._file = open(path, "wb")
+
+        color_type = {"L": 0, "1": 0, "P": 3, "RGBA": 6}[mode]
+        bit_depth = 1 if mode in BILEVEL_MODES else 8
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0))
+        if mode == "P":
+            self._chunk(b"PLTE", bytes(value for color in palette for value in color))
+            self._chunk(b"tRNS", b"\x00")
+
+    def _chunk(self, kind, data):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(kind)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+    def _queue(self, data):
+        if data:
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+        if self._pending_bytes >= PNG_CHUNK_BYTES:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._chunk(b"IDAT", b"".join(self._pending))
+            self._pending = []
+            self._pending_bytes = 0
+
+    def write_rows(self, rows):
+        rows = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), -1)
+        if self.mode == "1":
+            check_bilevel(rows)
+        if self.mode in BILEVEL_MODES:
+            rows = pack_bilevel(rows)
+        # Every scanline starts with its filter type byte (0 = None)
+        filtered = np.zeros((rows.shape[0], rows.shape[1] + 1), np.uint8)
+        filtered[:, 1:] = rows
+        self._queue(self._compressor.compress(filtered.tobytes()))
+        self.rows_written += rows.shape[0]
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._queue(self._compressor.flush())
+        self._flush()
+        self._chunk(b"IEND", b"")
+        self._file.close()
+        if self.rows_written != self.height:
+            raise ValueError(f"PNG expected {self.height} rows, got {self.rows_written}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+class StripedTIFFWriter:
+    """
+    Write a striped (Big)TIFF band by band.
+
+    Strip data is appended as it arrives; the IFD with the strip offsets is
+    written at the end and the header is patched to point at it. compression
+    is None, "deflate" (zlib here) or one of PILLOW_TIFF_COMPRESSIONS, with
+    the horizontal predictor when predictor is set ("group4" needs mode "1").
+    """
+    def __init__(self, path, width, height, mode="L", compression=None, rows_per_strip=64, bigtiff=None,
+                 predictor=False):
+        if mode not in MODE_CHANNELS or mode == "P":
+            raise ValueError(f"Unsupported mode for TIFF writer: {mode}")
+        if compression not in (None, "deflate") + PILLOW_TIFF_COMPRESSIONS:
+            raise ValueError(f"Unsupported TIFF compression: {compression}")
+        if compression == "group4" and mode != "1":
+            raise ValueError(f"TIFF compression {compression} is not available for mode {mode}")
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.channels = MODE_CHANNELS[mode]
+        self.compression = compression
+        self.predictor = predictor and compression in ("tiff_lzw", "tiff_adobe_deflate")
+        # Compression, photometric and predictor tags of the Pillow-coded strips
+        self._coding_tags = {259: 8 if compression == "deflate" else 1, 262: 1 if mode in ("L", "1") else 2}
+        self.rows_per_strip = rows_per_strip
+        if bigtiff is None:
+            bigtiff = width * height * self.channels >= BIGTIFF_THRESHOLD
+        self.bigtiff = bigtiff
+        self.rows_written = 0
+        self._carry = None
+        self._offsets = []
+        self._byte_counts = []
+        self._file = open(path, "wb")
+
+        if bigtiff:
+            self._file.write(b"II+\x00" + struct.pack("<HHQ", 8, 0, 0))
+        else:
+            self._file.write(b"II*\x00" + struct.pack("<I", 0))
+
+    def write_rows(self, rows):
+        rows = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), self.width * self.channels)
+        if self.mode == "1":
+            check_bilevel(rows)
+        if self._carry is not None:
+            rows = np.concatenate([self._carry, rows])
+            self._carry = None
+        full = len(rows) - len(rows) % self.rows_per_strip
+        for start in range(0, full, self.rows_per_strip):
+            self._write_strip(rows[start:start + self.rows_per_strip])
+        if full < len(rows):
+            self._carry = rows[full:].copy()
+
+    def _encode_with_pillow(self, strip):
+        """
+        Code one strip as a single-strip TIFF and return its strip data
+        """
+        img = Image.fromarray(strip.reshape(len(strip), self.width, self.channels) if self.channels > 1 else strip)
+        if self.mode == "1":
+            img = img.convert("1", dither=Image.Dither.NONE)
+        buf = io.BytesIO()
+        img.save(buf, "TIFF", compression=self.compression, strip_size=1 << 30,
+                 tiffinfo={317: 2} if self.predictor else {})
+        coded = Image.open(buf)
+        for tag in (259, 262, 317):
+            if tag in coded.tag_v2:
+                self._coding_tags[tag] = coded.tag_v2[tag]
+        (offset,), (count,) = coded.tag_v2[273], coded.tag_v2[279]
+        return buf.getvalue()[offset:offset + count]
+
+    def _write_strip(self, strip):
+        if self.compression in PILLOW_TIFF_COMPRESSIONS:
+            data = self._encode_with_pillow(strip)
+        else:
+            data = (pack_bilevel(strip) if self.mode == "1" else strip).tobytes()
+            if self.compression == "deflate":
+                data = zlib.compress(data, 6)
+        self._offsets.append(self._file.tell())
+        self._byte_counts.append(len(data))
+        self._file.write(data)
+        self.rows_written += len(strip)
+
+    def _align(self):
+        if self._file.tell() % 2:
+            self._file.write(b"\x00")
+
+    def _write_array(self, fmt, values):
+        self._align()
+        offset = self._file.tell()
+        self._file.write(struct.pack(f"<{len(values)}{fmt}", *values))
+        return offset
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self._carry is not None:
+            self._write_strip(self._carry)
+            self._carry = None
+        if self.rows_written != self.height:
+            self._file.close()
+            raise ValueError(f"TIFF expected {self.height} rows, got {self.rows_written}")
+
+        SHORT, LONG, LONG8 = 3, 4, 16
+        offset_type, offset_fmt = (LONG8, "Q") if self.bigtiff else (LONG, "I")
+        inline_bytes = 8 if self.bigtiff else 4
+
+        def array_entry(tag, typ, fmt, values):
+            # Values that do not fit in the entry itself are stored out of line
+            size = struct.calcsize(f"<{fmt}") * len(values)
+            if size <= inline_bytes:
+                return (tag, typ, len(values), struct.pack(f"<{len(values)}{fmt}", *values))
+            return (tag, typ, len(values), self._write_array(fmt, values))
+
+        entries = [
+            (256, LONG, 1, self.width),
+            (257, LONG, 1, self.height),
+            array_entry(258, SHORT, "H", [1 if self.mode == "1" else 8] * self.channels),
+            (259, SHORT, 1, self._coding_tags[259]),
+            (262, SHORT, 1, self._coding_tags[262]),
+            array_entry(273, offset_type, offset_fmt, self._offsets),
+            (277, SHORT, 1, self.channels),
+            (278, LONG, 1, self.rows_per_strip),
+            array_entry(279, offset_type, offset_fmt, self._byte_counts),
+            (284, SHORT, 1, 1),
+        ]
+        if 317 in self._coding_tags:
+            entries.append((317, SHORT, 1, self._coding_tags[317]))  # Predictor
+        if self.mode == "RGBA":
+            entries.append((338, SHORT, 1, 2))  # Unassociated alpha
+
+        self._align()
+        ifd_offset = self._file.tell()
+        count_fmt, entry_fmt, next_fmt = ("<Q", "<HHQ", "<Q") if self.bigtiff else ("<H", "<HHI", "<I")
+        self._file.write(struct.pack(count_fmt, len(entries)))
+        for tag, typ, count, value in entries:
+            self._file.write(struct.pack(entry_fmt, tag, typ, count))
+            if isinstance(value, bytes):
+                self._file.write(value.ljust(inline_bytes, b"\x00"))
+            elif typ == SHORT:
+                self._file.write(struct.pack("<H", value).ljust(inline_bytes, b"\x00"))
+            else:
+                self._file.write(struct.pack(next_fmt, value))
+        self._file.write(struct.pack(next_fmt, 0))
+
+        # Point the header at the IFD
+        self._file.seek(8 if self.bigtiff else 4)
+        self._file.write(struct.pack(next_fmt, ifd_offset))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def open_writer(path, fmt, width, height, mode="L", profile=None, palette=None):
+    """
+    Return a streaming writer for fmt ('png' or 'tiff'). With an
+    export.EncoderProfile, PNG uses its zlib settings and TIFF its
+    compression and predictor; 1-bit TIFFs use CCITT G4 like save_image.
+    Without one (or with a profile that sets no TIFF compression), TIFF
+    strips are deflated.
+    """
+    if fmt == "png":
+        if profile is not None:
+            return StripedPNGWriter(path, width, height, mode, profile.png_compress_level, profile.png_strategy,
+                                    palette)
+        return StripedPNGWriter(path, width, height, mode, palette=palette)
+    if fmt in ("tiff", "tif"):
+        if mode == "1":
+            return StripedTIFFWriter(path, width, height, mode, compression="group4")
+        if profile is not None and profile.tiff_compression:
+            return StripedTIFFWriter(path, width, height, mode, compression=profile.tiff_compression,
+                                     predictor=profile.tiff_predictor)
+        return StripedTIFFWriter(path, width, height, mode, compression="deflate")
+    raise ValueError(f"Streaming export is not available for format: {fmt}")